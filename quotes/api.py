@@ -0,0 +1,221 @@
+import base64
+import json
+from functools import wraps
+
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+
+from .leaderboard import leaderboards
+from .models import Quote
+from .search import search_quotes
+
+API_FIELDS = (
+    'id', 'text', 'source', 'type_of_source', 'movie_link', 'weight',
+    'views', 'likes', 'dislikes', 'created_at',
+)
+ORDERINGS = {
+    'likes': 'likes',
+    'recent': 'created_at',
+}
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Целые в SQLite — знаковые 64-битные
+MIN_INT = -2 ** 63
+MAX_INT = 2 ** 63 - 1
+
+
+class ApiError(Exception):
+    """
+    Ошибка в параметрах запроса к API.
+    """
+
+
+def encode_cursor(value, quote_id):
+    """
+    Кодирует курсор страницы: значение ключа сортировки и id последней
+    цитаты.
+    """
+    raw = json.dumps([value, quote_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _is_int(value):
+    return (
+        isinstance(value, int)
+        and not isinstance(value, bool)
+        and MIN_INT <= value <= MAX_INT
+    )
+
+
+def _decode_cursor(cursor, key):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, quote_id = json.loads(base64.urlsafe_b64decode(padded))
+        if not _is_int(quote_id):
+            raise ValueError
+        if key == 'created_at':
+            if not isinstance(value, str):
+                raise ValueError
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError
+        elif not _is_int(value):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ApiError('Неверный курсор')
+    return value, quote_id
+
+
+def _requested_fields(request):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(API_FIELDS)
+    requested = [field for field in fields.split(',') if field]
+    unknown = set(requested) - set(API_FIELDS)
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return requested
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('Неверный limit')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _serialize(row, fields):
+    item = {field: row[field] for field in fields}
+    if 'created_at' in item:
+        item['created_at'] = item['created_at'].isoformat()
+    return item
+
+
+def _keyset_page(request, queryset):
+    """
+    Возвращает страницу цитат с пагинацией по курсору: строки
+    упорядочены по (key DESC, id ASC), следующая страница начинается
+    сразу после последней пары (key, id) без OFFSET.
+    """
+    ordering = request.GET.get('order', 'likes')
+    if ordering not in ORDERINGS:
+        raise ApiError('Неверная сортировка')
+    key = ORDERINGS[ordering]
+    fields = _requested_fields(request)
+    limit = _limit(request)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        value, last_id = _decode_cursor(cursor, key)
+        queryset = queryset.filter(
+            Q(**{f'{key}__lt': value}) | Q(**{key: value, 'id__gt': last_id})
+        )
+    rows = list(
+        queryset.order_by(f'-{key}', 'id')
+        .values(*set(fields) | {key, 'id'})[:limit + 1]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        value = last[key]
+        if key == 'created_at':
+            value = value.isoformat()
+        next_cursor = encode_cursor(value, last['id'])
+    return JsonResponse({
+        'results': [_serialize(row, fields) for row in rows],
+        'next': next_cursor,
+    })
+
+
+def api_view(view):
+    """
+    Превращает ApiError в ответ 400 с описанием ошибки.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+    return wrapper
+
+
+@api_view
+def quote_list(request):
+    """
+    Список цитат. Параметры: order (likes или recent), type, cursor,
+    limit, fields.
+    """
+    queryset = Quote.objects.all()
+    type_filter = request.GET.get('type')
+    if type_filter:
+        queryset = queryset.filter(type_of_source=type_filter)
+    return _keyset_page(request, queryset)
+
+
+@api_view
+def quote_detail(request, quote_id):
+    """
+    Одна цитата по id. Параметр fields.
+    """
+    fields = _requested_fields(request)
+    row = Quote.objects.filter(id=quote_id).values(*fields).first()
+    if row is None:
+        return JsonResponse({'error': 'Цитата не найдена'}, status=404)
+    return JsonResponse(_serialize(row, fields))
+
+
+@api_view
+def quotes_by_source(request, source):
+    """
+    Цитаты одного источника с той же пагинацией, что и у списка.
+    """
+    return _keyset_page(request, Quote.objects.filter(source=source))
+
+
+@api_view
+def top(request):
+    """
+    Топ-10 цитат из рейтингов в памяти. Параметры: type, window=week,
+    fields. Поле score — число лайков за выбранный период.
+    """
+    fields = _requested_fields(request)
+    type_filter = request.GET.get('type')
+    if type_filter and type_filter not in dict(Quote.TYPE_CHOICES):
+        raise ApiError('Неизвестный тип источника')
+    window = request.GET.get('window')
+    if window not in (None, 'week'):
+        raise ApiError('Неверный период')
+    ranked = leaderboards.top(type_filter or None, window)
+    rows = {
+        row['id']: row
+        for row in Quote.objects.filter(
+            id__in=[quote_id for quote_id, _ in ranked]
+        ).values(*set(fields) | {'id'})
+    }
+    results = []
+    for quote_id, score in ranked:
+        if quote_id in rows:
+            item = _serialize(rows[quote_id], fields)
+            item['score'] = score
+            results.append(item)
+    return JsonResponse({'results': results})
+
+
+@api_view
+def search(request):
+    """
+    Полнотекстовый поиск. Параметры: q, type, limit. Поля text_snippet
+    и source_snippet содержат HTML с подсветкой найденных слов.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        raise ApiError('Пустой запрос')
+    type_filter = request.GET.get('type')
+    if type_filter and type_filter not in dict(Quote.TYPE_CHOICES):
+        raise ApiError('Неизвестный тип источника')
+    results = search_quotes(query, type_filter or None, _limit(request))
+    return JsonResponse({'results': results})
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class QuotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quotes'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .metrics import instrument_template_render
+
+        instrument_template_render()
@@ -0,0 +1,120 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from .cards import aattach_card_versions
+from .leaderboard import leaderboards
+from .models import Quote
+from .quote_cache import quote_cache
+from .routers import read_replica, read_your_writes
+from .sampler import sampler
+from .seen import SeenQuotes, achoose_unseen
+from .view_counter import view_counter
+from .vote_log import log_vote
+from .voting import AlreadyVoted, cast_vote
+
+
+async def _is_authenticated(request):
+    """
+    Загружает пользователя из сессии в потоке, чтобы шаблоны могли
+    обращаться к request.user без синхронных запросов.
+    """
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+@read_replica
+async def random_quote(request):
+    """
+    Асинхронная версия random_quote для запуска под ASGI.
+    """
+    await _is_authenticated(request)
+    seen = SeenQuotes.from_request(request)
+    selected = None
+    for _ in range(2):
+        quote_id = await achoose_unseen(seen, sampler.asample, len(sampler))
+        if quote_id is None:
+            break
+        selected = await quote_cache.aget(quote_id)
+        if selected is not None:
+            break
+        # Индекс устарел (цитату удалили в другом процессе)
+        sampler.invalidate()
+    if selected is not None:
+        selected.views += view_counter.pending(selected.id) + 1
+        await view_counter.aadd(selected.id)
+        await aattach_card_versions([selected])
+
+    response = render(request, 'quotes/quote.html', {'quote': selected})
+    seen.save(response)
+    return response
+
+
+async def vote(request, quote_id, vote_type):
+    """
+    Асинхронная версия vote. Транзакция голосования выполняется
+    в потоке: асинхронный ORM не поддерживает транзакции.
+    """
+    if not await _is_authenticated(request):
+        return redirect_to_login(request.get_full_path(), settings.LOGIN_URL)
+
+    if vote_type not in ['like', 'dislike']:
+        return JsonResponse(
+            {'error': 'Неверный тип голосования'}, status=400
+        )
+
+    record_vote = log_vote if settings.QUOTES_VOTE_LOG else cast_vote
+    try:
+        likes, dislikes = await sync_to_async(record_vote)(
+            request.user, quote_id, vote_type
+        )
+    except AlreadyVoted:
+        return JsonResponse(
+            {'error': 'Вы уже голосовали этим способом'}, status=400
+        )
+    except IntegrityError:
+        return JsonResponse(
+            {'error': 'Ошибка при сохранении голосования'}, status=400
+        )
+    return read_your_writes(
+        JsonResponse({'likes': likes, 'dislikes': dislikes})
+    )
+
+
+@read_replica
+async def top_quotes(request):
+    """
+    Асинхронная версия top_quotes.
+    """
+    await _is_authenticated(request)
+    type_filter = request.GET.get('type')
+    if type_filter not in dict(Quote.TYPE_CHOICES):
+        type_filter = None
+    window = request.GET.get('window')
+    if window != 'week':
+        window = None
+
+    ranked = await sync_to_async(leaderboards.top)(type_filter, window)
+    quotes_by_id = {
+        quote.id: quote
+        async for quote in Quote.objects.filter(
+            id__in=[quote_id for quote_id, _ in ranked]
+        )
+    }
+    quotes = []
+    for quote_id, score in ranked:
+        quote = quotes_by_id.get(quote_id)
+        if quote is not None:
+            quote.score = score
+            quotes.append(quote)
+    await aattach_card_versions(quotes)
+
+    context = {
+        'quotes': quotes,
+        'type_filter': type_filter,
+        'window': window,
+        'type_choices_sorted': sorted(Quote.TYPE_CHOICES, key=lambda x: x[1]),
+    }
+    return render(request, 'quotes/top_quotes.html', context)
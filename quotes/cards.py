@@ -0,0 +1,66 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import reading_replica
+
+CARD_VERSION_KEY = 'quotes:card_version:{quote_id}'
+
+
+def get_card_versions(quote_ids):
+    """
+    Возвращает версии карточек цитат одним запросом к кэшу в виде
+    словаря {quote_id: версия}. Начальная версия берется из времени,
+    чтобы после вытеснения ключа не вернуться к старой версии.
+    """
+    keys = {
+        CARD_VERSION_KEY.format(quote_id=quote_id): quote_id
+        for quote_id in quote_ids
+    }
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        initial = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, initial, None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def attach_card_versions(quotes):
+    """
+    Проставляет цитатам атрибут card_version для ключа кэша
+    фрагмента карточки.
+    """
+    versions = get_card_versions([quote.id for quote in quotes])
+    for quote in quotes:
+        quote.card_version = versions.get(quote.id)
+    return quotes
+
+
+aattach_card_versions = sync_to_async(attach_card_versions)
+
+
+def bump_card_version(quote_id):
+    """
+    Увеличивает версию карточки цитаты, после чего фрагмент будет
+    отрисован заново.
+    """
+    try:
+        cache.incr(CARD_VERSION_KEY.format(quote_id=quote_id))
+    except ValueError:
+        # Версии нет в кэше: следующее чтение начнет новую
+        pass
+
+
+def card_settings(request):
+    """
+    Контекстный процессор: время жизни кэша фрагментов карточек.
+    Карточки, отрисованные по данным реплики, не сохраняются (время
+    жизни 0), но готовые фрагменты текущей версии используются.
+    """
+    if reading_replica():
+        return {'card_ttl': 0}
+    return {'card_ttl': getattr(settings, 'QUOTES_CARD_CACHE_TTL', 3600)}
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_vote_log_cache(app_configs, **kwargs):
+    """
+    Журнал голосов переносит команда fold_votes в отдельном процессе.
+    Сброс кэшей после переноса доходит до веб-процессов только через
+    общий кэш, поэтому кэш в памяти процесса с QUOTES_VOTE_LOG
+    не допускается.
+    """
+    if not getattr(settings, 'QUOTES_VOTE_LOG', False):
+        return []
+    aliases = {
+        'default',
+        getattr(settings, 'QUOTES_QUOTE_CACHE_ALIAS', 'default'),
+    }
+    errors = []
+    for alias in sorted(aliases):
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in LOCAL_CACHE_BACKENDS:
+            errors.append(Error(
+                f'Кэш {alias!r} ({backend}) не общий для процессов.',
+                hint=(
+                    'С QUOTES_VOTE_LOG=1 нужен общий кэш (Redis, '
+                    'Memcached, база данных), иначе fold_votes не '
+                    'сбросит кэши веб-процессов.'
+                ),
+                id='quotes.E001',
+            ))
+    return errors
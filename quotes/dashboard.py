@@ -0,0 +1,132 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils.timezone import now, timedelta
+
+from .models import Quote, QuoteVote
+from .routers import primary_reads
+
+User = get_user_model()
+
+VERSION_KEY = 'quotes:data_version'
+SNAPSHOT_KEY = 'quotes:dashboard:{version}'
+
+
+def build_dashboard_charts():
+    """
+    Собирает данные графиков дашборда: все показатели по типам
+    источника считаются одним запросом, история голосов за 7 дней —
+    другим. Каждый график возвращается отдельной серией.
+    """
+    type_choices_dict = dict(Quote.TYPE_CHOICES)
+
+    by_type = (
+        Quote.objects.values('type_of_source')
+        .annotate(
+            total=Count('id'),
+            total_likes=Sum('likes'),
+            total_dislikes=Sum('dislikes'),
+            total_views=Sum('views'),
+        )
+        .order_by('type_of_source')
+    )
+    type_labels = []
+    totals = []
+    likes = []
+    dislikes = []
+    views = []
+    for item in by_type:
+        type_labels.append(type_choices_dict.get(
+            item['type_of_source'], item['type_of_source']
+        ))
+        totals.append(item['total'])
+        likes.append(item['total_likes'] or 0)
+        dislikes.append(item['total_dislikes'] or 0)
+        views.append(item['total_views'] or 0)
+
+    start_date = now() - timedelta(days=7)
+    votes_by_day = (
+        QuoteVote.objects.filter(created_at__gte=start_date)
+        .values('created_at__date')
+        .annotate(
+            likes=Count('id', filter=Q(vote_type='like')),
+            dislikes=Count('id', filter=Q(vote_type='dislike')),
+        )
+        .order_by('created_at__date')
+    )
+    dates = []
+    likes_by_day = []
+    dislikes_by_day = []
+    for item in votes_by_day:
+        dates.append(item['created_at__date'].strftime('%Y-%m-%d'))
+        likes_by_day.append(item['likes'])
+        dislikes_by_day.append(item['dislikes'])
+
+    top_authors = (
+        User.objects.annotate(total_quotes=Count('quotes'))
+        .order_by('-total_quotes')
+        .values_list('username', 'total_quotes')[:5]
+    )
+    authors = []
+    author_totals = []
+    for username, total_quotes in top_authors:
+        authors.append(username)
+        author_totals.append(total_quotes)
+
+    return {
+        'quotes_by_type': {'labels': type_labels, 'data': {'total': totals}},
+        'votes_by_type': {
+            'labels': type_labels,
+            'data': {'likes': likes, 'dislikes': dislikes},
+        },
+        'likes_last_days': {'labels': dates, 'data': {'total': likes_by_day}},
+        'dislikes_last_days': {
+            'labels': dates, 'data': {'total': dislikes_by_day},
+        },
+        'views_by_type': {'labels': type_labels, 'data': {'total': views}},
+        'likes_by_type': {'labels': type_labels, 'data': {'total': likes}},
+        'top_authors': {'labels': authors, 'data': {'total': author_totals}},
+    }
+
+
+def get_data_version():
+    """
+    Возвращает текущую версию данных дашборда. Начальное значение
+    берется из времени, чтобы версии разных процессов не совпадали.
+    """
+    cache.add(VERSION_KEY, int(time.time() * 1000), None)
+    return cache.get(VERSION_KEY)
+
+
+def get_dashboard_snapshot():
+    """
+    Возвращает снимок дашборда для текущей версии данных:
+    словарь с версией, временем построения и сериями графиков.
+    """
+    version = get_data_version()
+    key = SNAPSHOT_KEY.format(version=version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        with primary_reads():
+            charts = build_dashboard_charts()
+        snapshot = {
+            'version': version,
+            'modified': now(),
+            'charts': charts,
+        }
+        cache.set(key, snapshot, getattr(settings, 'QUOTES_DASHBOARD_TTL', 60))
+    return snapshot
+
+
+def invalidate_dashboard():
+    """
+    Увеличивает версию данных, после чего снимок дашборда будет
+    построен заново.
+    """
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        get_data_version()
@@ -0,0 +1,138 @@
+import hashlib
+import random
+import re
+
+from django.db.models import Q
+
+from .models import Quote, QuoteBucket
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SIMILARITY_THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20250901)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def normalize_text(text):
+    """
+    Приводит текст к виду, в котором не различаются регистр,
+    пунктуация и пробелы.
+    """
+    text = text.casefold().replace('ё', 'е')
+    text = re.sub(r'[\W_]+', ' ', text)
+    return text.strip()
+
+
+def text_hash(text):
+    """
+    Компактный хэш нормализованного текста для проверки точных
+    повторов.
+    """
+    return hashlib.blake2b(
+        normalize_text(text).encode('utf-8'), digest_size=16
+    ).hexdigest()
+
+
+def _hash64(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(),
+        'big',
+    )
+
+
+def shingles(text):
+    """
+    Множество символьных n-грамм нормализованного текста.
+    """
+    normalized = normalize_text(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {
+        normalized[i:i + SHINGLE_SIZE]
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text):
+    """
+    Сигнатура MinHash текста из NUM_PERMUTATIONS значений.
+    """
+    hashes = [_hash64(shingle) for shingle in shingles(text)]
+    if not hashes:
+        return [0] * NUM_PERMUTATIONS
+    return [
+        min((a * value + b) % _PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def lsh_buckets(text):
+    """
+    Возвращает пары (полоса, корзина) LSH: сигнатура делится на BANDS
+    полос, каждая полоса хэшируется в знаковое 64-битное число.
+    """
+    signature = minhash(text)
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(
+            ','.join(map(str, rows)).encode(), digest_size=8
+        ).digest()
+        buckets.append((band, int.from_bytes(digest, 'big', signed=True)))
+    return buckets
+
+
+def similarity(first, second):
+    """
+    Коэффициент Жаккара по множествам n-грамм двух текстов.
+    """
+    first, second = shingles(first), shingles(second)
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def find_near_duplicates(text, exclude_id=None):
+    """
+    Ищет цитаты, похожие на текст. Кандидаты выбираются по совпадению
+    хотя бы одной корзины LSH, сходство проверяется только для них.
+    Возвращает список пар (цитата, сходство).
+    """
+    condition = Q()
+    for band, bucket in lsh_buckets(text):
+        condition |= Q(band=band, bucket=bucket)
+    candidates = QuoteBucket.objects.filter(condition)
+    if exclude_id:
+        candidates = candidates.exclude(quote_id=exclude_id)
+    candidate_ids = set(candidates.values_list('quote_id', flat=True))
+    if not candidate_ids:
+        return []
+    matches = []
+    for quote in Quote.objects.filter(id__in=candidate_ids):
+        score = similarity(text, quote.text)
+        if score >= SIMILARITY_THRESHOLD:
+            matches.append((quote, score))
+    return sorted(matches, key=lambda match: -match[1])
+
+
+def index_quotes(quotes):
+    """
+    Сохраняет корзины LSH для цитат, заменяя прежние.
+    """
+    quotes = list(quotes)
+    QuoteBucket.objects.filter(quote__in=quotes).delete()
+    QuoteBucket.objects.bulk_create(
+        (
+            QuoteBucket(quote=quote, band=band, bucket=bucket)
+            for quote in quotes
+            for band, bucket in lsh_buckets(quote.text)
+        ),
+        batch_size=2000,
+    )
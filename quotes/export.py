@@ -0,0 +1,82 @@
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from .models import Quote, QuoteVote
+
+EXPORT_FIELDS = {
+    'quotes': (
+        'id', 'text', 'source', 'type_of_source', 'movie_link', 'weight',
+        'views', 'likes', 'dislikes', 'author_id', 'created_at',
+    ),
+    'votes': ('id', 'quote_id', 'user_id', 'vote_type', 'created_at'),
+}
+
+
+class _Echo:
+    """
+    Файлоподобный объект, возвращающий записанную строку, чтобы
+    csv.writer можно было использовать для потоковой выдачи.
+    """
+
+    def write(self, value):
+        return value
+
+
+def parse_export_date(value):
+    """
+    Разбирает дату или дату со временем в формате ISO. Возвращает None
+    для пустого значения, при неверном формате выбрасывает ValueError.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Неверная дата: {value}')
+        moment = datetime.combine(day, time.min)
+    return make_aware(moment) if is_naive(moment) else moment
+
+
+def export_queryset(model_name, type_of_source=None, since=None,
+                    until=None):
+    """
+    Возвращает queryset словарей для выгрузки цитат или голосов с
+    фильтрами по типу источника и диапазону created_at.
+    """
+    if model_name == 'quotes':
+        queryset = Quote.objects.all()
+        type_lookup = 'type_of_source'
+    else:
+        queryset = QuoteVote.objects.all()
+        type_lookup = 'quote__type_of_source'
+    if type_of_source:
+        queryset = queryset.filter(**{type_lookup: type_of_source})
+    if since:
+        queryset = queryset.filter(created_at__gte=since)
+    if until:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset.order_by('id').values(*EXPORT_FIELDS[model_name])
+
+
+def export_lines(queryset, file_format, chunk_size=2000):
+    """
+    Построчно выдает строки JSONL или CSV, читая базу порциями
+    и не создавая объекты моделей.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if file_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder,
+                             ensure_ascii=False) + '\n'
+        return
+    fields = list(queryset.query.values_select)
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([row[field] for field in fields])
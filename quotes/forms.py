@@ -3,6 +3,7 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 
+from .dedup import find_near_duplicates, text_hash
 from .models import Quote
 
 
@@ -47,18 +48,26 @@ class QuoteForm(forms.ModelForm):
         )
     )
 
-    def clean(self):
+    def clean_text(self):
         """
-        Проверяет, чтобы для одного источника не было более трёх цитат.
+        Отклоняет текст, совпадающий с существующей цитатой с точностью
+        до регистра, пунктуации и пробелов, а также почти совпадающий
+        с ней.
         """
-        cleaned_data = super().clean()
-        source = cleaned_data.get("source")
-        if source and Quote.objects.filter(source=source).count() >= 3:
+        text = self.cleaned_data['text']
+        duplicates = Quote.objects.filter(text_hash=text_hash(text))
+        if self.instance.pk:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise forms.ValidationError("Такая цитата уже существует.")
+        similar = find_near_duplicates(text, exclude_id=self.instance.pk)
+        if similar:
+            quote = similar[0][0]
             raise forms.ValidationError(
-                "Упс, вас уже опередили. Для данного произведения добавлено "
-                "максимальное количество цитат."
+                f"Очень похожая цитата уже есть: «{quote.text}» "
+                f"({quote.source})."
             )
-        return cleaned_data
+        return text
 
 
 class CustomUserCreationForm(UserCreationForm):
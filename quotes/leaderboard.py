@@ -0,0 +1,266 @@
+import heapq
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.timezone import now, timedelta
+
+from .models import Quote, QuoteVote
+from .routers import primary_reads
+
+WINDOW_DAYS = 7
+VERSION_KEY = 'quotes:leaderboard_version'
+
+
+class TopK:
+    """
+    Ограниченный набор лучших цитат по числу лайков. Хранит с запасом
+    до capacity кандидатов; floor — наибольший счет среди цитат,
+    не попавших в набор (None, если в наборе все цитаты).
+    """
+
+    def __init__(self, size, rows, complete):
+        self.size = size
+        self.capacity = size * 4
+        self.scores = dict(rows)
+        self.floor = None
+        if not complete and self.scores:
+            self.floor = min(self.scores.values())
+
+    def update(self, quote_id, score):
+        if (
+            quote_id not in self.scores
+            and self.floor is not None
+            and score <= self.floor
+        ):
+            return
+        self.scores[quote_id] = score
+        if len(self.scores) > self.capacity:
+            evicted = min(
+                self.scores, key=lambda key: (self.scores[key], -key)
+            )
+            evicted_score = self.scores.pop(evicted)
+            self.floor = max(self.floor or 0, evicted_score)
+
+    def remove(self, quote_id):
+        self.scores.pop(quote_id, None)
+
+    def top(self):
+        """
+        Возвращает список [(id, score)] лучших цитат или None, если
+        набор устарел и его нужно перестроить из базы данных.
+        """
+        ranked = heapq.nsmallest(
+            self.size,
+            self.scores.items(),
+            key=lambda item: (-item[1], item[0]),
+        )
+        if self.floor is not None and (
+            len(ranked) < self.size or ranked[-1][1] < self.floor
+        ):
+            return None
+        return ranked
+
+
+class Leaderboards:
+    """
+    Рейтинги цитат по лайкам: за все время (общий и по каждому типу
+    источника) и за последние 7 дней. Обновляются голосованием без
+    запросов к базе и периодически перестраиваются из базы, чтобы
+    учесть голоса других процессов и сдвиг окна. Сброс рейтингов
+    публикуется версией в общем кэше: процесс перестраивает их, когда
+    версия отличается от той, при которой они построены.
+    """
+
+    def __init__(self, size=10):
+        self.size = size
+        self._lock = threading.Lock()
+        self._boards = None
+        self._week = None
+        self._week_types = None
+        self._built_at = 0
+        self._version = None
+
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'QUOTES_LEADERBOARD_REFRESH', 300)
+
+    def _load_board(self, type_of_source):
+        quotes = Quote.objects.all()
+        if type_of_source:
+            quotes = quotes.filter(type_of_source=type_of_source)
+        capacity = self.size * 4
+        rows = list(
+            quotes.order_by('-likes', 'id')
+            .values_list('id', 'likes')[:capacity]
+        )
+        return TopK(self.size, rows, complete=len(rows) < capacity)
+
+    def _load_week(self):
+        """
+        Загружает рейтинг за последние 7 дней одним запросом.
+        """
+        rows = (
+            QuoteVote.objects
+            .filter(
+                vote_type='like',
+                created_at__gte=now() - timedelta(days=WINDOW_DAYS),
+            )
+            .values_list('quote_id', 'quote__type_of_source')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        self._week = Counter()
+        self._week_types = {}
+        for quote_id, type_of_source, total in rows:
+            self._week[quote_id] = total
+            self._week_types[quote_id] = type_of_source
+
+    def _build(self, version):
+        """
+        Перестраивает рейтинги из базы данных.
+        """
+        self._version = version
+        self._boards = {None: self._load_board(None)}
+        for type_of_source, _ in Quote.TYPE_CHOICES:
+            self._boards[type_of_source] = self._load_board(type_of_source)
+        self._load_week()
+        self._built_at = time.monotonic()
+
+    def _ensure_built(self):
+        version = cache.get(VERSION_KEY)
+        if (
+            self._boards is None
+            or version != self._version
+            or time.monotonic() - self._built_at >= self.refresh_interval
+        ):
+            self._build(version)
+
+    def _top(self, type_of_source, window):
+        """
+        Возвращает рейтинг из построенных наборов. Вызывается под
+        блокировкой.
+        """
+        if window == 'week':
+            if self._week is None:
+                self._load_week()
+            items = self._week.items()
+            if type_of_source:
+                items = [
+                    item for item in items
+                    if self._week_types.get(item[0]) == type_of_source
+                ]
+            return heapq.nsmallest(
+                self.size, items, key=lambda item: (-item[1], item[0])
+            )
+        board = self._boards.get(type_of_source)
+        if board is None:
+            return []
+        ranked = board.top()
+        if ranked is None:
+            self._boards[type_of_source] = board = (
+                self._load_board(type_of_source)
+            )
+            ranked = board.top()
+        return ranked
+
+    def top(self, type_of_source=None, window=None):
+        """
+        Возвращает список [(id, score)] лучших цитат. window='week'
+        выбирает рейтинг за последние 7 дней. Рейтинги строятся
+        по основной базе: построенные по отстающей реплике держались бы
+        до следующего сброса.
+        """
+        with self._lock, primary_reads():
+            self._ensure_built()
+            return self._top(type_of_source, window)
+
+    def record_counts(self, rows, week_changed):
+        """
+        Учитывает новые числа лайков цитат [(id, type_of_source, likes)],
+        перенесенных из журнала голосов, и возвращает True, если
+        изменился какой-либо топ: цитата вошла в него, вышла из него
+        или сменила в нем счет. Другие процессы сбрасывают рейтинги
+        только в этом случае, изменения за пределами топов они учтут
+        при плановой перестройке. С week_changed рейтинг за неделю
+        загружается заново.
+        """
+        with self._lock, primary_reads():
+            self._ensure_built()
+            keys = list(self._boards)
+            windows = (None, 'week') if week_changed else (None,)
+            before = [
+                self._top(key, window) for key in keys for window in windows
+            ]
+            for quote_id, type_of_source, likes in rows:
+                for key in (None, type_of_source):
+                    if key in self._boards:
+                        self._boards[key].update(quote_id, likes)
+            if week_changed:
+                self._load_week()
+            after = [
+                self._top(key, window) for key in keys for window in windows
+            ]
+            return after != before
+
+    def record_vote(self, quote_id, type_of_source, likes, vote_type,
+                    changed):
+        """
+        Учитывает голос: новое число лайков цитаты и, для нового лайка,
+        рейтинг за неделю. Смена голоса сдвигает лайк, поставленный
+        в неизвестный момент, поэтому недельный рейтинг помечается
+        устаревшим и загружается заново при следующем обращении.
+        """
+        with self._lock:
+            if self._boards is None:
+                return
+            for key in (None, type_of_source):
+                if key in self._boards:
+                    self._boards[key].update(quote_id, likes)
+            if changed:
+                self._week = None
+            elif vote_type == 'like' and self._week is not None:
+                self._week[quote_id] += 1
+                self._week_types[quote_id] = type_of_source
+
+    def record_quote(self, quote_id, type_of_source, likes,
+                     previous_type=None):
+        """
+        Учитывает создание или изменение цитаты.
+        """
+        with self._lock:
+            if self._boards is None:
+                return
+            if previous_type and previous_type != type_of_source:
+                if previous_type in self._boards:
+                    self._boards[previous_type].remove(quote_id)
+                if self._week is not None and quote_id in self._week_types:
+                    self._week_types[quote_id] = type_of_source
+            for key in (None, type_of_source):
+                if key in self._boards:
+                    self._boards[key].update(quote_id, likes)
+
+    def remove_quote(self, quote_id):
+        with self._lock:
+            if self._boards is None:
+                return
+            for board in self._boards.values():
+                board.remove(quote_id)
+            if self._week is not None:
+                self._week.pop(quote_id, None)
+                self._week_types.pop(quote_id, None)
+
+    def invalidate(self):
+        """
+        Сбрасывает рейтинги во всех процессах, использующих общий кэш.
+        """
+        with self._lock:
+            self._boards = None
+        cache.add(VERSION_KEY, 0, None)
+        cache.incr(VERSION_KEY)
+
+
+leaderboards = Leaderboards()
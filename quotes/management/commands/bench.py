@@ -0,0 +1,246 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import URLPattern, reverse
+from django.utils.timezone import now
+
+from quotes import urls as quote_urls
+from quotes.models import Quote
+from quotes.seeding import seed_database
+from quotes.view_counter import view_counter
+
+# Страницы, которые нельзя измерять повторными запросами
+SKIPPED_URLS = {'logout'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет временную базу данных заданного объема, замеряет '
+        'каждый URL приложения (p50/p95 и количество SQL-запросов), '
+        'сохраняет результат в JSON и сравнивает его с базовым. '
+        'Завершается ошибкой, если какой-либо URL ответил кодом '
+        'ошибки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quotes', type=int, default=10000)
+        parser.add_argument('--votes', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument(
+            '--iterations', type=int, default=30,
+            help='Количество запросов к каждому URL.',
+        )
+        parser.add_argument(
+            '--output', default='bench_results.json',
+            help='Файл для результатов.',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Файл с базовыми результатами для сравнения.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост p95 относительно базового (доля).',
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            database = settings.DATABASES['default']
+            database['TEST']['NAME'] = os.path.join(directory, 'bench.db')
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                started = time.perf_counter()
+                users = seed_database(
+                    options['quotes'], options['votes'], options['users']
+                )
+                self.stdout.write(
+                    f'База заполнена за {time.perf_counter() - started:.1f} с'
+                )
+                results = self.run(users[0], options['iterations'])
+                view_counter.flush()
+            finally:
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        report = {
+            'scale': {
+                'quotes': options['quotes'],
+                'votes': options['votes'],
+                'users': options['users'],
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as source:
+                baseline = json.load(source)['results']
+        regressions = self.report(results, baseline, options['tolerance'])
+        broken = [
+            name for name, result in results.items()
+            if not 200 <= result['status'] < 400
+        ]
+        if broken:
+            raise CommandError(
+                'URL ответили кодом ошибки: ' + ', '.join(broken)
+            )
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности: ' + ', '.join(regressions)
+            )
+
+    def bench_urls(self, user):
+        """
+        Возвращает для каждого именованного URL приложения функцию,
+        строящую (метод, адрес, данные) для номера итерации.
+        """
+        quote = Quote.objects.filter(author=user).order_by('-id').first()
+        since = now().date().isoformat()
+        arguments = {
+            'vote': lambda i: (
+                'post',
+                reverse('vote', args=[
+                    quote.id, 'like' if i % 2 else 'dislike'
+                ]),
+                {},
+            ),
+            'edit_quote': lambda i: (
+                'get', reverse('edit_quote', args=[quote.id]), {},
+            ),
+            'api_quote_detail': lambda i: (
+                'get', reverse('api_quote_detail', args=[quote.id]), {},
+            ),
+            'api_quotes_by_source': lambda i: (
+                'get',
+                reverse('api_quotes_by_source', args=[quote.source]),
+                {},
+            ),
+            'export_data': lambda i: (
+                'get',
+                reverse('export_data', args=['votes']),
+                {'since': since},
+            ),
+            # Заполненная база содержит тексты вида «Цитата N»
+            'search': lambda i: ('get', reverse('search'), {'q': 'цитата'}),
+            'api_search': lambda i: (
+                'get', reverse('api_search'), {'q': 'цитата'},
+            ),
+            'user_votes': lambda i: (
+                'get',
+                reverse('user_votes'),
+                {'ids': ','.join(
+                    str(quote_id) for quote_id in range(
+                        max(1, quote.id - 19), quote.id + 1
+                    )
+                )},
+            ),
+        }
+        urls = {}
+        for pattern in quote_urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            if pattern.name in SKIPPED_URLS:
+                continue
+            urls[pattern.name] = arguments.get(
+                pattern.name,
+                lambda i, name=pattern.name: ('get', reverse(name), {}),
+            )
+        return urls
+
+    def run(self, user, iterations):
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+        client = Client()
+        client.force_login(user)
+        results = {}
+        for name, build in self.bench_urls(user).items():
+            cache.clear()
+            latencies = []
+            queries = []
+            status = None
+            for i in range(iterations + 1):
+                method, url, data = build(i)
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(url, data)
+                    if response.streaming:
+                        for _ in response.streaming_content:
+                            pass
+                    elapsed = time.perf_counter() - started
+                # Запоминается первый код ошибки, чтобы он не потерялся
+                # за успешными ответами следующих итераций
+                if status is None or 200 <= status < 400:
+                    status = response.status_code
+                if i == 0:
+                    cold = elapsed
+                    continue
+                latencies.append(elapsed)
+                queries.append(len(captured.captured_queries))
+            latencies.sort()
+            results[name] = {
+                'status': status,
+                'cold_ms': round(cold * 1000, 2),
+                'p50_ms': round(statistics.median(latencies) * 1000, 2),
+                'p95_ms': round(
+                    latencies[max(0, int(len(latencies) * 0.95) - 1)]
+                    * 1000,
+                    2,
+                ),
+                'queries': statistics.median_high(queries),
+            }
+        return results
+
+    def report(self, results, baseline, tolerance):
+        """
+        Печатает таблицу результатов и возвращает список URL
+        с регрессией относительно базовых результатов.
+        """
+        regressions = []
+        self.stdout.write(
+            f'{"URL":<24}{"код":>5}{"холодный":>10}{"p50":>9}{"p95":>9}'
+            f'{"SQL":>5}  сравнение'
+        )
+        for name, result in results.items():
+            note = ''
+            base = (baseline or {}).get(name)
+            if base:
+                slower = (
+                    result['p95_ms'] > base['p95_ms'] * (1 + tolerance)
+                    and result['p95_ms'] - base['p95_ms'] > 1
+                )
+                more_queries = result['queries'] > base['queries']
+                if slower or more_queries:
+                    regressions.append(name)
+                note = (
+                    f'p95 {base["p95_ms"]} -> {result["p95_ms"]} мс, '
+                    f'SQL {base["queries"]} -> {result["queries"]}'
+                )
+                if slower or more_queries:
+                    note = self.style.ERROR(note)
+            if not 200 <= result['status'] < 400:
+                note = self.style.ERROR(f'код {result["status"]}. {note}')
+            self.stdout.write(
+                f'{name:<24}{result["status"]:>5}{result["cold_ms"]:>10}'
+                f'{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+                f'{result["queries"]:>5}  {note}'
+            )
+        return regressions
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from quotes.query_plans import find_full_scans
+from quotes.sampler import sampler
+from quotes.seeding import seed_database
+from quotes.source_index import source_index
+from quotes.view_counter import view_counter
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет тестовую базу, выполняет запросы всех представлений '
+        'и проверяет через EXPLAIN QUERY PLAN, что ни один из них не '
+        'читает таблицы приложения полным сканированием и не сортирует '
+        'их строки во временном B-дереве.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quotes', type=int, default=3000,
+            help='Количество цитат в тестовой базе.',
+        )
+        parser.add_argument(
+            '--votes', type=int, default=10000,
+            help='Количество голосов в тестовой базе.',
+        )
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Количество голосующих пользователей.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка поддерживает только SQLite.')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            user = seed_database(
+                options['quotes'], options['votes'], options['users']
+            )[0]
+            log = self.stdout.write if options['verbosity'] > 1 else None
+            failures = find_full_scans(user, log)
+            view_counter.flush()
+        finally:
+            sampler.invalidate()
+            source_index.invalidate()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+        if failures:
+            raise CommandError(
+                'Полное сканирование или сортировка таблиц:\n'
+                + '\n'.join(failures)
+            )
+        self.stdout.write(
+            self.style.SUCCESS('Полных сканирований и сортировок нет.')
+        )
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from quotes.models import Quote
+from quotes.seeding import seed_database
+from quotes.view_counter import view_counter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность синхронных (WSGI) и '
+        'асинхронных (ASGI) версий random_quote, vote и top_quotes '
+        'под конкурентной нагрузкой внутри процесса.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=600)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--quotes', type=int, default=2000)
+        parser.add_argument(
+            '--mode', choices=('sync', 'async'),
+            help='Запустить только один режим и вывести результат в JSON '
+                 '(используется самой командой).',
+        )
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            result = self.run_mode(options)
+            self.stdout.write(json.dumps(result))
+            return
+
+        results = {}
+        for mode in ('sync', 'async'):
+            # URL-конфигурация выбирается при запуске процесса,
+            # поэтому каждый режим измеряется в отдельном процессе
+            env = dict(
+                os.environ, QUOTES_ASYNC_VIEWS='1' if mode == 'async' else '0'
+            )
+            completed = subprocess.run(
+                [
+                    sys.executable, sys.argv[0], 'compare_async',
+                    '--mode', mode,
+                    '--requests', str(options['requests']),
+                    '--concurrency', str(options['concurrency']),
+                    '--quotes', str(options['quotes']),
+                ],
+                env=env, capture_output=True, text=True,
+            )
+            if completed.returncode:
+                raise CommandError(completed.stderr)
+            results[mode] = json.loads(completed.stdout.splitlines()[-1])
+
+        self.stdout.write(
+            f'{"режим":<8}{"запр/с":>10}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"ошибки":>8}'
+        )
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode:<8}{result["throughput"]:>10.1f}'
+                f'{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}'
+                f'{result["errors"]:>8}'
+            )
+
+    def run_mode(self, options):
+        if settings.QUOTES_ASYNC_VIEWS != (options['mode'] == 'async'):
+            raise CommandError(
+                'QUOTES_ASYNC_VIEWS не соответствует режиму измерения.'
+            )
+        with tempfile.TemporaryDirectory() as directory:
+            database = settings.DATABASES['default']
+            database['TEST']['NAME'] = os.path.join(directory, 'bench.db')
+            database.setdefault('OPTIONS', {})['timeout'] = 30
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                users = seed_database(
+                    options['quotes'], total_users=options['concurrency']
+                )
+                plan = self.request_plan(options['requests'])
+                if options['mode'] == 'sync':
+                    return self.run_sync(plan, users, options['concurrency'])
+                return asyncio.run(
+                    self.run_async(plan, users, options['concurrency'])
+                )
+            finally:
+                view_counter.flush()
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+    @staticmethod
+    def request_plan(total):
+        """
+        Смесь запросов: просмотры, топ и голоса за случайные цитаты.
+        """
+        quote_ids = list(Quote.objects.values_list('id', flat=True))
+        rng = random.Random(0)
+        plan = []
+        for _ in range(total):
+            kind = rng.random()
+            if kind < 0.6:
+                plan.append(('get', reverse('random_quote')))
+            elif kind < 0.8:
+                plan.append(('get', reverse('top_quotes')))
+            else:
+                plan.append(('post', reverse('vote', args=[
+                    rng.choice(quote_ids), rng.choice(['like', 'dislike'])
+                ])))
+        return plan
+
+    @staticmethod
+    def summary(latencies, errors, elapsed):
+        latencies = sorted(latencies)
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        }
+
+    def run_sync(self, plan, users, concurrency):
+        clients = []
+        for user in users[:concurrency]:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        def worker(index):
+            client = clients[index]
+            latencies = []
+            errors = 0
+            for method, url in plan[index::concurrency]:
+                started = time.perf_counter()
+                response = getattr(client, method)(url)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code >= 500
+            return latencies, errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(worker, range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return self.summary(
+            [value for latencies, _ in results for value in latencies],
+            sum(errors for _, errors in results),
+            elapsed,
+        )
+
+    async def run_async(self, plan, users, concurrency):
+        clients = []
+        for user in users[:concurrency]:
+            client = AsyncClient()
+            await asyncio.to_thread(client.force_login, user)
+            clients.append(client)
+
+        async def worker(index):
+            client = clients[index]
+            latencies = []
+            errors = 0
+            for method, url in plan[index::concurrency]:
+                started = time.perf_counter()
+                response = await getattr(client, method)(url)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code >= 500
+            return latencies, errors
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(worker(index) for index in range(concurrency))
+        )
+        elapsed = time.perf_counter() - started
+        return self.summary(
+            [value for latencies, _ in results for value in latencies],
+            sum(errors for _, errors in results),
+            elapsed,
+        )
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quotes.export import (
+    EXPORT_FIELDS, export_lines, export_queryset, parse_export_date,
+)
+from quotes.models import Quote
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает цитаты или голоса в JSONL или CSV порциями, '
+        'не загружая всю таблицу в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(EXPORT_FIELDS))
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl',
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки (по умолчанию stdout).',
+        )
+        parser.add_argument(
+            '--type', choices=[key for key, _ in Quote.TYPE_CHOICES],
+            help='Только цитаты указанного типа источника.',
+        )
+        parser.add_argument(
+            '--since', help='Созданные не раньше даты (ISO).',
+        )
+        parser.add_argument(
+            '--until', help='Созданные раньше даты (ISO).',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_export_date(options['since'])
+            until = parse_export_date(options['until'])
+        except ValueError as error:
+            raise CommandError(error)
+        queryset = export_queryset(
+            options['model'], options['type'], since, until
+        )
+        lines = export_lines(
+            queryset, options['format'], options['chunk_size']
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
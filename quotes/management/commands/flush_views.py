@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from quotes.view_counter import view_counter
+
+
+class Command(BaseCommand):
+    help = (
+        'Записывает в базу просмотры, которые процессы сервера сохранили '
+        'в файл QUOTES_VIEW_BUFFER_SPOOL, не сумев записать их при '
+        'завершении. Буферы работающих процессов команда не видит: '
+        'они записываются сами по интервалу.'
+    )
+
+    def handle(self, *args, **options):
+        flushed = view_counter.flush_spool()
+        self.stdout.write(
+            self.style.SUCCESS(f'Записано просмотров: {flushed}')
+        )
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from quotes.vote_log import fold_events, prune_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит записи журнала голосов в QuoteVote и счетчики цитат '
+        'пачками. Продолжает с последней перенесенной записи, поэтому '
+        'команду можно прерывать и запускать повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество записей журнала в одной транзакции.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Пауза в секундах, когда новых записей нет.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Перенести все накопленные записи и завершиться.',
+        )
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='Удалять перенесенные записи журнала.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть положительным.')
+        total = 0
+        try:
+            while True:
+                try:
+                    folded = fold_events(batch_size)
+                except DatabaseError as exc:
+                    # База занята или недоступна: повторим после паузы
+                    self.stderr.write(f'Ошибка переноса голосов: {exc}')
+                    folded = 0
+                total += folded
+                if folded:
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Перенесено голосов: {folded}')
+                    continue
+                if options['prune']:
+                    prune_events()
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            self.style.SUCCESS(f'Перенесено голосов: {total}')
+        )
@@ -0,0 +1,201 @@
+import csv
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+
+from quotes.dedup import index_quotes, text_hash
+from quotes.models import MAX_QUOTES_PER_SOURCE, SOURCE_LIMIT_MESSAGE, Quote
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково импортирует цитаты из CSV или JSONL. Проверяет лимит '
+        'в 3 цитаты на источник и уникальность текста, вставляет '
+        'цитаты пачками, отклоненные строки пишет в отдельный файл.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .csv или .jsonl.')
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'),
+            help='Формат файла (по умолчанию по расширению).',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество цитат в одной вставке.',
+        )
+        parser.add_argument(
+            '--rejects',
+            help='Файл для отклоненных строк (по умолчанию '
+                 '<path>.rejects.jsonl).',
+        )
+        parser.add_argument(
+            '--offset', type=int, default=0,
+            help='Пропустить указанное количество строк данных '
+                 '(для продолжения прерванного импорта).',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError('Поддерживаются только файлы CSV и JSONL.')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('Размер пачки должен быть положительным.')
+        rejects_path = options['rejects'] or f'{path}.rejects.jsonl'
+
+        self.load_existing()
+        self.imported = 0
+        self.rejected = 0
+        line = options['offset']
+        batch = []
+        with open(path, encoding='utf-8', newline='') as source_file, \
+                open(rejects_path, 'a', encoding='utf-8') as rejects:
+            self.rejects = rejects
+            rows = self.read_rows(source_file, file_format)
+            for line, row in rows:
+                if line <= options['offset']:
+                    continue
+                quote = self.build_quote(line, row)
+                if quote is None:
+                    continue
+                batch.append((line, row, quote))
+                if len(batch) >= batch_size:
+                    self.insert(batch)
+                    batch = []
+                    self.stdout.write(f'Обработано строк: {line}')
+            self.insert(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {self.imported}, отклонено: {self.rejected}, '
+            f'последняя строка: {line}.'
+        ))
+
+    def load_existing(self):
+        """
+        Загружает в память количество цитат по источникам и хэши
+        нормализованных текстов существующих цитат.
+        """
+        self.source_counts = Counter(dict(
+            Quote.objects.order_by()
+            .values_list('source')
+            .annotate(total=Count('id'))
+        ))
+        self.digests = set(
+            Quote.objects.values_list('text_hash', flat=True)
+            .iterator(chunk_size=2000)
+        )
+        self.type_keys = {key for key, _ in Quote.TYPE_CHOICES}
+
+    @staticmethod
+    def read_rows(source_file, file_format):
+        """
+        Построчно читает файл и возвращает пары (номер строки данных,
+        словарь полей).
+        """
+        if file_format == 'csv':
+            yield from enumerate(csv.DictReader(source_file), start=1)
+            return
+        for line, raw in enumerate(source_file, start=1):
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                row = json.loads(raw)
+            except json.JSONDecodeError:
+                row = {'raw': raw}
+            yield line, row
+
+    def reject(self, line, row, error):
+        self.rejected += 1
+        self.rejects.write(json.dumps(
+            {'line': line, 'error': error, 'row': row},
+            ensure_ascii=False,
+        ) + '\n')
+
+    def build_quote(self, line, row):
+        """
+        Проверяет строку и возвращает несохраненную цитату или None,
+        если строка отклонена.
+        """
+        if not isinstance(row, dict):
+            self.reject(line, row, 'Строка должна быть объектом JSON.')
+            return None
+        fields = ('text', 'source', 'type_of_source', 'movie_link')
+        if any(
+            not isinstance(row.get(field), (str, type(None)))
+            for field in fields
+        ):
+            self.reject(line, row, 'Текстовые поля должны быть строками.')
+            return None
+        text = (row.get('text') or '').strip()
+        source = (row.get('source') or '').strip()
+        type_of_source = (row.get('type_of_source') or 'film').strip()
+        if not text or not source:
+            self.reject(line, row, 'Не указан текст или источник.')
+            return None
+        if type_of_source not in self.type_keys:
+            self.reject(line, row, 'Неизвестный тип источника.')
+            return None
+        weight = row.get('weight')
+        if weight is None or weight == '':
+            weight = 1
+        try:
+            weight = int(weight)
+        except (TypeError, ValueError):
+            weight = -1
+        if weight < 0:
+            self.reject(line, row, 'Вес должен быть целым числом >= 0.')
+            return None
+        digest = text_hash(text)
+        if digest in self.digests:
+            self.reject(line, row, 'Такая цитата уже существует.')
+            return None
+        if self.source_counts[source] >= MAX_QUOTES_PER_SOURCE:
+            self.reject(line, row, SOURCE_LIMIT_MESSAGE.format(
+                source=source, limit=MAX_QUOTES_PER_SOURCE
+            ))
+            return None
+        self.digests.add(digest)
+        self.source_counts[source] += 1
+        return Quote(
+            text=text,
+            text_hash=digest,
+            source=source,
+            type_of_source=type_of_source,
+            weight=weight,
+            movie_link=(row.get('movie_link') or '').strip() or None,
+        )
+
+    def insert(self, batch):
+        """
+        Вставляет пачку цитат одним bulk_create вместе с корзинами LSH.
+        Если пачку вставить не удалось (цитату добавили параллельно),
+        вставляет цитаты по одной.
+        """
+        if not batch:
+            return
+        try:
+            with transaction.atomic():
+                index_quotes(Quote.objects.bulk_create(
+                    quote for _, _, quote in batch
+                ))
+            self.imported += len(batch)
+            return
+        except IntegrityError:
+            pass
+        for line, row, quote in batch:
+            try:
+                with transaction.atomic():
+                    quote.save()
+                self.imported += 1
+            except IntegrityError:
+                self.reject(line, row, 'Такая цитата уже существует.')
+            except ValidationError as exc:
+                self.reject(line, row, exc.messages[0])
@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from quotes.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файл реплики через backup API '
+        'SQLite. С --interval повторяет копирование в цикле.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Пауза в секундах между копированиями.',
+        )
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError(
+                'Реплика не настроена: запустите с QUOTES_REPLICA=1.'
+            )
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Команда поддерживает только SQLite.')
+        target = connections[alias].settings_dict['NAME']
+        try:
+            while True:
+                started = time.perf_counter()
+                primary.ensure_connection()
+                replica = sqlite3.connect(target)
+                try:
+                    primary.connection.backup(replica)
+                finally:
+                    replica.close()
+                self.stdout.write(self.style.SUCCESS(
+                    f'Реплика обновлена за '
+                    f'{time.perf_counter() - started:.2f} с.'
+                ))
+                if options['interval'] is None:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
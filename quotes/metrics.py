@@ -0,0 +1,209 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+METRICS = (
+    ('quotes_request_duration_seconds', 'Полное время обработки запроса.',
+     LATENCY_BUCKETS),
+    ('quotes_request_sql_queries', 'Количество SQL-запросов за запрос.',
+     QUERY_BUCKETS),
+    ('quotes_request_sql_seconds', 'Суммарное время SQL-запросов.',
+     LATENCY_BUCKETS),
+    ('quotes_request_render_seconds', 'Время отрисовки шаблонов.',
+     LATENCY_BUCKETS),
+)
+
+_current = ContextVar('quotes_request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Счетчики одного запроса: SQL-запросы и время отрисовки шаблонов.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин в формате Prometheus.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Гистограммы метрик запросов по имени URL в памяти процесса.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, view, values):
+        with self._lock:
+            for (name, _, buckets), value in zip(METRICS, values):
+                key = (name, view)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(buckets)
+                self._histograms[key].observe(value)
+
+    def render(self):
+        """
+        Возвращает метрики в текстовом формате Prometheus.
+        """
+        lines = []
+        with self._lock:
+            for name, description, _ in METRICS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(
+                    self._histograms.items()
+                ):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(
+                        histogram.buckets + ('+Inf',), histogram.counts
+                    ):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                            f'{cumulative}'
+                        )
+                    lines.append(
+                        f'{name}_sum{{view="{view}"}} {histogram.total}'
+                    )
+                    lines.append(
+                        f'{name}_count{{view="{view}"}} {histogram.count}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обертка выполнения SQL: считает запросы и их время для текущего
+    запроса. Подключается к каждому соединению через connection_created.
+    """
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def instrument_template_render():
+    """
+    Оборачивает отрисовку шаблонов Django, чтобы учитывать ее время
+    в метриках текущего запроса.
+    """
+    from django.template.backends.django import Template
+
+    original_render = Template.render
+    if getattr(original_render, 'instrumented', False):
+        return
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return original_render(self, context, request)
+        started = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            stats.render_time += time.perf_counter() - started
+
+    render.instrumented = True
+    Template.render = render
+
+
+def _finish(request, stats, started):
+    duration = time.perf_counter() - started
+    match = getattr(request, 'resolver_match', None)
+    view = match.url_name if match and match.url_name else 'unknown'
+    registry.observe(
+        view, (duration, stats.queries, stats.sql_time, stats.render_time)
+    )
+
+    query_budget = getattr(settings, 'QUOTES_METRICS_QUERY_BUDGET', None)
+    latency_budget = getattr(settings, 'QUOTES_METRICS_LATENCY_BUDGET', None)
+    if (
+        (query_budget is not None and stats.queries > query_budget)
+        or (latency_budget is not None and duration > latency_budget)
+    ):
+        logger.warning(
+            'Превышен бюджет запроса %s (%s): %d SQL за %.1f мс, '
+            'всего %.1f мс, шаблоны %.1f мс',
+            request.path, view, stats.queries, stats.sql_time * 1000,
+            duration * 1000, stats.render_time * 1000,
+        )
+
+
+class MetricsMiddleware:
+    """
+    Собирает для каждого запроса количество и время SQL, время
+    отрисовки шаблонов и полное время ответа. Работает и с
+    синхронными, и с асинхронными представлениями.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
+            _finish(request, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            _current.reset(token)
+            _finish(request, stats, started)
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0007_quotevote_created_at_alter_quote_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quote',
+            name='movie_link',
+            field=models.URLField(blank=True, max_length=500, null=True, verbose_name='Ссылка на произведение'),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['source'], name='quote_source_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['-likes'], name='quote_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['type_of_source', 'source'], name='quote_type_source_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quotevote',
+            index=models.Index(fields=['created_at', 'vote_type'], name='quotevote_created_type_idx'),
+        ),
+    ]
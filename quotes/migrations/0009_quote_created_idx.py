@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0008_quote_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['-created_at'], name='quote_created_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+FTS_TABLE = 'quotes_quote_fts'
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        text, source,
+        content='quotes_quote', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER quotes_quote_fts_insert AFTER INSERT ON quotes_quote
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, text, source)
+        VALUES (new.id, new.text, new.source);
+    END
+    """,
+    f"""
+    CREATE TRIGGER quotes_quote_fts_delete AFTER DELETE ON quotes_quote
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text, source)
+        VALUES ('delete', old.id, old.text, old.source);
+    END
+    """,
+    f"""
+    CREATE TRIGGER quotes_quote_fts_update
+    AFTER UPDATE OF text, source ON quotes_quote
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text, source)
+        VALUES ('delete', old.id, old.text, old.source);
+        INSERT INTO {FTS_TABLE} (rowid, text, source)
+        VALUES (new.id, new.text, new.source);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS quotes_quote_fts_update',
+    'DROP TRIGGER IF EXISTS quotes_quote_fts_delete',
+    'DROP TRIGGER IF EXISTS quotes_quote_fts_insert',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def run_sqlite(statements):
+    """
+    Полнотекстовый индекс FTS5 есть только в SQLite, на других базах
+    миграция ничего не делает.
+    """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0009_quote_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
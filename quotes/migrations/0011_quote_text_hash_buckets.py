@@ -0,0 +1,188 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:34
+
+import hashlib
+import random
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'quotes_quote_fts'
+
+# Добавление и удаление text_hash пересоздает таблицу quotes_quote
+# в SQLite вместе с триггерами: триггеры полнотекстового индекса
+# из 0010 создаются заново сразу после этого, индекс перестраивается.
+FTS_TRIGGERS_SQL = [
+    'DROP TRIGGER IF EXISTS quotes_quote_fts_insert',
+    'DROP TRIGGER IF EXISTS quotes_quote_fts_delete',
+    'DROP TRIGGER IF EXISTS quotes_quote_fts_update',
+    f"""
+    CREATE TRIGGER quotes_quote_fts_insert AFTER INSERT ON quotes_quote
+    BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, text, source)
+        VALUES (new.id, new.text, new.source);
+    END
+    """,
+    f"""
+    CREATE TRIGGER quotes_quote_fts_delete AFTER DELETE ON quotes_quote
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text, source)
+        VALUES ('delete', old.id, old.text, old.source);
+    END
+    """,
+    f"""
+    CREATE TRIGGER quotes_quote_fts_update
+    AFTER UPDATE OF text, source ON quotes_quote
+    BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, text, source)
+        VALUES ('delete', old.id, old.text, old.source);
+        INSERT INTO {FTS_TABLE} (rowid, text, source)
+        VALUES (new.id, new.text, new.source);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+# Копия нормализации и MinHash из quotes.dedup на момент миграции:
+# изменения в коде приложения не должны менять эту миграцию
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+CHUNK_SIZE = 1000
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20250901)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def normalize_text(text):
+    text = text.casefold().replace('ё', 'е')
+    text = re.sub(r'[\W_]+', ' ', text)
+    return text.strip()
+
+
+def text_hash(text):
+    return hashlib.blake2b(
+        normalize_text(text).encode('utf-8'), digest_size=16
+    ).hexdigest()
+
+
+def _hash64(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(),
+        'big',
+    )
+
+
+def shingles(text):
+    normalized = normalize_text(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {
+        normalized[i:i + SHINGLE_SIZE]
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text):
+    hashes = [_hash64(shingle) for shingle in shingles(text)]
+    if not hashes:
+        return [0] * NUM_PERMUTATIONS
+    return [
+        min((a * value + b) % _PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def lsh_buckets(text):
+    signature = minhash(text)
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(
+            ','.join(map(str, rows)).encode(), digest_size=8
+        ).digest()
+        buckets.append((band, int.from_bytes(digest, 'big', signed=True)))
+    return buckets
+
+
+def backfill(apps, schema_editor):
+    """
+    Заполняет хэши текстов и корзины LSH существующих цитат пачками
+    по CHUNK_SIZE цитат.
+    """
+    Quote = apps.get_model('quotes', 'Quote')
+    QuoteBucket = apps.get_model('quotes', 'QuoteBucket')
+    last_id = 0
+    while True:
+        chunk = list(
+            Quote.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'text')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        for quote in chunk:
+            quote.text_hash = text_hash(quote.text)
+        Quote.objects.bulk_update(chunk, ['text_hash'])
+        QuoteBucket.objects.bulk_create(
+            QuoteBucket(quote_id=quote.id, band=band, bucket=bucket)
+            for quote in chunk
+            for band, bucket in lsh_buckets(quote.text)
+        )
+        last_id = chunk[-1].id
+
+
+def restore_fts_triggers(apps, schema_editor):
+    """
+    Триггеры FTS5 есть только в SQLite, на других базах функция
+    ничего не делает.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0010_quote_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuoteBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+            ],
+        ),
+        # При откате RemoveField снова пересоздает таблицу
+        migrations.RunPython(migrations.RunPython.noop, restore_fts_triggers),
+        migrations.AddField(
+            model_name='quote',
+            name='text_hash',
+            field=models.CharField(default='', editable=False, max_length=32),
+        ),
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['text_hash'], name='quote_text_hash_idx'),
+        ),
+        migrations.AddField(
+            model_name='quotebucket',
+            name='quote',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='quotes.quote'),
+        ),
+        migrations.AddIndex(
+            model_name='quotebucket',
+            index=models.Index(fields=['band', 'bucket'], name='quotebucket_band_bucket_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.2.23 on 2026-10-17 03:36
+
+from django.db import migrations, models
+
+LIMIT = 3
+LIMIT_ERROR = 'quotes_source_limit'
+QUOTA_TABLE = 'quotes_sourcequota'
+
+CREATE_SQL = [
+    f"""
+    INSERT INTO {QUOTA_TABLE} (source, quotes)
+    SELECT source, COUNT(*) FROM quotes_quote GROUP BY source
+    """,
+    f"""
+    CREATE TRIGGER quotes_source_limit_insert
+    BEFORE INSERT ON quotes_quote
+    WHEN (SELECT quotes FROM {QUOTA_TABLE} WHERE source = new.source)
+        >= {LIMIT}
+    BEGIN
+        SELECT RAISE(ABORT, '{LIMIT_ERROR}');
+    END
+    """,
+    f"""
+    CREATE TRIGGER quotes_source_limit_update
+    BEFORE UPDATE OF source ON quotes_quote
+    WHEN new.source != old.source
+        AND (SELECT quotes FROM {QUOTA_TABLE} WHERE source = new.source)
+        >= {LIMIT}
+    BEGIN
+        SELECT RAISE(ABORT, '{LIMIT_ERROR}');
+    END
+    """,
+    f"""
+    CREATE TRIGGER quotes_source_count_insert
+    AFTER INSERT ON quotes_quote
+    BEGIN
+        INSERT INTO {QUOTA_TABLE} (source, quotes) VALUES (new.source, 1)
+        ON CONFLICT (source) DO UPDATE SET quotes = quotes + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER quotes_source_count_update
+    AFTER UPDATE OF source ON quotes_quote
+    WHEN new.source != old.source
+    BEGIN
+        UPDATE {QUOTA_TABLE} SET quotes = quotes - 1
+        WHERE source = old.source;
+        INSERT INTO {QUOTA_TABLE} (source, quotes) VALUES (new.source, 1)
+        ON CONFLICT (source) DO UPDATE SET quotes = quotes + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER quotes_source_count_delete
+    AFTER DELETE ON quotes_quote
+    BEGIN
+        UPDATE {QUOTA_TABLE} SET quotes = quotes - 1
+        WHERE source = old.source;
+    END
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS quotes_source_count_delete',
+    'DROP TRIGGER IF EXISTS quotes_source_count_update',
+    'DROP TRIGGER IF EXISTS quotes_source_count_insert',
+    'DROP TRIGGER IF EXISTS quotes_source_limit_update',
+    'DROP TRIGGER IF EXISTS quotes_source_limit_insert',
+]
+
+
+def run_sqlite(statements):
+    """
+    Триггеры написаны для SQLite, на других базах миграция ничего
+    не делает.
+    """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0011_quote_text_hash_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceQuota',
+            fields=[
+                ('source', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('quotes', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(run_sqlite(CREATE_SQL), run_sqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-17 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotes', '0013_vote_event_log'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='quote',
+            name='quote_source_idx',
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['source', '-likes', 'id'], name='quote_source_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['type_of_source', '-likes', 'id'], name='quote_type_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['type_of_source', '-created_at', 'id'], name='quote_type_created_idx'),
+        ),
+    ]
@@ -1,6 +1,13 @@
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models
+
+MAX_QUOTES_PER_SOURCE = 3
+# Единственный текст ошибки о превышении лимита: его выбрасывают
+# и clean, и save, когда лимит соблюла база
+SOURCE_LIMIT_MESSAGE = "Для источника '{source}' уже есть {limit} цитаты."
+# Сообщение, с которым триггер базы отклоняет лишнюю цитату источника
+SOURCE_LIMIT_ERROR = 'quotes_source_limit'
 
 
 class Quote(models.Model):
@@ -29,6 +36,7 @@ class Quote(models.Model):
             "unique": "Такая цитата уже существует."
         }
     )
+    text_hash = models.CharField(max_length=32, default='', editable=False)
     source = models.CharField(max_length=255)
     type_of_source = models.CharField(
         max_length=20,
@@ -47,19 +55,61 @@ class Quote(models.Model):
     dislikes = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['source', '-likes', 'id'],
+                name='quote_source_likes_idx',
+            ),
+            models.Index(fields=['text_hash'], name='quote_text_hash_idx'),
+            models.Index(fields=['-likes'], name='quote_likes_idx'),
+            models.Index(fields=['-created_at'], name='quote_created_idx'),
+            models.Index(
+                fields=['type_of_source', 'source'],
+                name='quote_type_source_idx',
+            ),
+            models.Index(
+                fields=['type_of_source', '-likes', 'id'],
+                name='quote_type_likes_idx',
+            ),
+            models.Index(
+                fields=['type_of_source', '-created_at', 'id'],
+                name='quote_type_created_idx',
+            ),
+        ]
+
     def clean(self):
         """
-        Проверяет, что для одного источника не больше трёх цитат.
+        Предварительно проверяет, что у источника меньше трёх цитат.
+        Окончательно лимит соблюдает база при сохранении.
+        """
+        previous = getattr(self, '_indexed_source', None)
+        if previous is not None and previous[1] == self.source:
+            return
+        if SourceQuota.objects.filter(
+            source=self.source, quotes__gte=MAX_QUOTES_PER_SOURCE
+        ).exists():
+            raise ValidationError(self.source_limit_message())
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет цитату. Если триггер базы отклонил цитату из-за
+        лимита на источник, выбрасывает ValidationError.
+        """
+        try:
+            super().save(*args, **kwargs)
+        except IntegrityError as exc:
+            if SOURCE_LIMIT_ERROR in str(exc):
+                raise ValidationError(self.source_limit_message()) from exc
+            raise
+
+    def source_limit_message(self):
+        """
+        Текст ошибки о превышении лимита цитат источника.
         """
-        if (
-            Quote.objects
-            .filter(source=self.source)
-            .exclude(id=self.id)
-            .count() >= 3
-        ):
-            raise ValidationError(
-                f"Для источника '{self.source}' уже есть 3 цитаты."
-            )
+        return SOURCE_LIMIT_MESSAGE.format(
+            source=self.source, limit=MAX_QUOTES_PER_SOURCE
+        )
 
     def __str__(self):
         """
@@ -68,6 +118,16 @@ class Quote(models.Model):
         return f"{self.text[:50]}... ({self.source})"
 
 
+class SourceQuota(models.Model):
+    """
+    Количество цитат источника. Строки ведут триггеры базы при вставке,
+    удалении и смене источника цитаты; они же не дают превысить
+    MAX_QUOTES_PER_SOURCE.
+    """
+    source = models.CharField(max_length=255, primary_key=True)
+    quotes = models.PositiveIntegerField(default=0)
+
+
 class QuoteVote(models.Model):
     """
     Модель голосования пользователя за цитату.
@@ -89,3 +149,62 @@ class QuoteVote(models.Model):
 
     class Meta:
         unique_together = ('user', 'quote')
+        indexes = [
+            models.Index(
+                fields=['created_at', 'vote_type'],
+                name='quotevote_created_type_idx',
+            ),
+        ]
+
+
+class VoteEvent(models.Model):
+    """
+    Запись журнала голосов. Представление голосования только добавляет
+    записи, в QuoteVote и счетчики цитат их переносит команда
+    fold_votes.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quote = models.ForeignKey(Quote, on_delete=models.CASCADE)
+    vote_type = models.CharField(
+        max_length=7, choices=QuoteVote.VOTE_CHOICES
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'quote', '-id'],
+                name='voteevent_user_quote_idx',
+            ),
+        ]
+
+
+class VoteLogPosition(models.Model):
+    """
+    Номер последней записи журнала голосов, перенесенной fold_votes.
+    Обновляется в одной транзакции с переносом, поэтому команду можно
+    прервать и запустить снова.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+
+class QuoteBucket(models.Model):
+    """
+    Корзина LSH по сигнатуре MinHash цитаты. Цитаты, у которых совпала
+    хотя бы одна пара (полоса, корзина), — кандидаты в почти-дубликаты.
+    """
+    quote = models.ForeignKey(
+        Quote,
+        on_delete=models.CASCADE,
+        related_name='buckets'
+    )
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['band', 'bucket'], name='quotebucket_band_bucket_idx'
+            ),
+        ]
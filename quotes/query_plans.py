@@ -0,0 +1,100 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .api import encode_cursor
+from .models import Quote
+from .quote_cache import quote_cache
+from .sampler import sampler
+from .source_index import source_index
+
+FULL_SCAN = re.compile(r'\bSCAN (\w+)$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+APP_TABLE = re.compile(r'\b(?:SCAN|SEARCH) quotes_')
+# Сортировку сгруппированных строк и ранжирование результатов
+# полнотекстового поиска индексом не заменить
+UNINDEXABLE_SORTS = (' GROUP BY ', ' MATCH ')
+SKIPPED_STATEMENTS = (
+    'INSERT', 'BEGIN', 'COMMIT', 'SAVEPOINT', 'RELEASE', 'ROLLBACK',
+)
+
+
+def find_full_scans(user, log=None):
+    """
+    Выполняет запросы к представлениям от имени user и возвращает
+    описания запросов с полным сканированием таблиц приложения или
+    сортировкой их строк во временном B-дереве. Функция log, если
+    передана, получает каждый запрос с его планом.
+    """
+    client = Client()
+    client.force_login(user)
+    quote = Quote.objects.filter(author=user).order_by('-id').first()
+    requests = [
+        ('get', reverse('random_quote'), {}),
+        ('get', reverse('top_quotes'), {}),
+        ('get', reverse('random_source_quotes'), {}),
+        ('get', reverse('random_source_quotes') + '?type=book', {}),
+        ('get', reverse('dashboard'), {}),
+        ('get', reverse('dashboard_data'), {}),
+        ('post', reverse('vote', args=[quote.id, 'like']), {}),
+        ('get', reverse('user_votes'), {'ids': f'{quote.id},1,2'}),
+        ('get', reverse('edit_quote', args=[quote.id]), {}),
+        ('get', reverse('api_quote_list'), {}),
+        ('get', reverse('api_quote_list'), {'order': 'recent'}),
+        ('get', reverse('api_quote_list'), {'type': 'book'}),
+        ('get', reverse('api_quote_list'), {
+            'type': 'book', 'cursor': encode_cursor(quote.likes, quote.id),
+        }),
+        ('get', reverse('api_quote_list'), {
+            'type': 'book',
+            'order': 'recent',
+            'cursor': encode_cursor(quote.created_at.isoformat(), quote.id),
+        }),
+        ('get', reverse('api_quote_detail', args=[quote.id]), {}),
+        ('get', reverse('api_quotes_by_source', args=[quote.source]), {}),
+        ('get', reverse('api_top'), {'window': 'week'}),
+        ('get', reverse('search'), {'q': 'цит', 'type': 'book'}),
+        ('post', reverse('add_quote'), {
+            'text': 'Новая цитата',
+            'source': quote.source,
+            'weight': 1,
+            'type_of_source': 'film',
+        }),
+    ]
+    # Индексы в памяти строятся один раз при старте процесса
+    sampler.invalidate()
+    source_index.invalidate()
+    sampler.sample()
+    source_index.random_source()
+
+    failures = []
+    for method, url, data in requests:
+        cache.clear()
+        quote_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            getattr(client, method)(url, data)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if sql.lstrip().upper().startswith(SKIPPED_STATEMENTS):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            sorts_app_rows = (
+                any(APP_TABLE.search(step) for step in plan)
+                and not any(part in sql for part in UNINDEXABLE_SORTS)
+            )
+            for step in plan:
+                match = FULL_SCAN.search(step)
+                if (
+                    match and match.group(1).startswith('quotes_')
+                    or sorts_app_rows and TEMP_SORT.search(step)
+                ):
+                    failures.append(f'{url}: {step}\n    {sql}')
+            if log is not None:
+                log(f'{url}: {sql}\n    ' + '\n    '.join(plan))
+    return failures
@@ -0,0 +1,157 @@
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Quote
+from .routers import primary_reads
+
+VERSION_KEY = 'quotes:quote_version:{quote_id}'
+QUOTE_KEY = 'quotes:quote:{quote_id}:{version}'
+RESULTS = ('local_hit', 'shared_hit', 'miss')
+
+
+class QuoteCache:
+    """
+    Двухуровневый кэш цитат по id. Первый уровень — LRU в памяти
+    процесса размером QUOTES_QUOTE_CACHE_SIZE, второй — общий кэш
+    Django (псевдоним QUOTES_QUOTE_CACHE_ALIAS). Ключи второго уровня
+    содержат версию цитаты, которую сбрасывают сигналы, голосование
+    и запись просмотров. Запись первого уровня без сверки версии
+    живет QUOTES_QUOTE_CACHE_LOCAL_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self.stats = Counter()
+
+    @property
+    def shared(self):
+        alias = getattr(settings, 'QUOTES_QUOTE_CACHE_ALIAS', 'default')
+        return caches[alias]
+
+    def _version(self, quote_id):
+        key = VERSION_KEY.format(quote_id=quote_id)
+        version = self.shared.get(key)
+        if version is None:
+            # Начальная версия из времени, чтобы после вытеснения ключа
+            # не вернуться к старому объекту
+            self.shared.add(key, int(time.time() * 1000), None)
+            version = self.shared.get(key)
+        return version
+
+    def _fresh(self, quote_id):
+        """
+        Возвращает запись первого уровня и признак того, что ее можно
+        отдать без сверки версии.
+        """
+        with self._lock:
+            entry = self._local.get(quote_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._local.move_to_end(quote_id)
+                self.stats['local_hit'] += 1
+                return entry, True
+        return entry, False
+
+    def get(self, quote_id):
+        """
+        Возвращает копию цитаты или None, если цитаты нет.
+        """
+        entry, fresh = self._fresh(quote_id)
+        if fresh:
+            return copy.copy(entry[2])
+        version = self._version(quote_id)
+        if entry is not None and entry[0] == version:
+            result, quote = 'local_hit', entry[2]
+        else:
+            key = QUOTE_KEY.format(quote_id=quote_id, version=version)
+            quote = self.shared.get(key)
+            if quote is not None:
+                result = 'shared_hit'
+            else:
+                result = 'miss'
+                with primary_reads():
+                    quote = Quote.objects.filter(id=quote_id).first()
+                if quote is None:
+                    with self._lock:
+                        self.stats[result] += 1
+                    return None
+                self.shared.set(
+                    key, quote,
+                    getattr(settings, 'QUOTES_QUOTE_CACHE_TTL', 3600),
+                )
+        self._store(quote_id, version, quote, result)
+        return copy.copy(quote)
+
+    async def aget(self, quote_id):
+        """
+        Асинхронный вариант get: общий кэш и база читаются в потоке,
+        только если цитаты нет в памяти процесса.
+        """
+        entry, fresh = self._fresh(quote_id)
+        if fresh:
+            return copy.copy(entry[2])
+        return await sync_to_async(self.get)(quote_id)
+
+    def _store(self, quote_id, version, quote, result):
+        expires = (
+            time.monotonic()
+            + getattr(settings, 'QUOTES_QUOTE_CACHE_LOCAL_TTL', 5)
+        )
+        with self._lock:
+            self.stats[result] += 1
+            self._local[quote_id] = (version, expires, quote)
+            self._local.move_to_end(quote_id)
+            size = getattr(settings, 'QUOTES_QUOTE_CACHE_SIZE', 1000)
+            while len(self._local) > size:
+                self._local.popitem(last=False)
+
+    def invalidate(self, *quote_ids):
+        """
+        Сбрасывает цитаты в памяти процесса и увеличивает их версии
+        в общем кэше, после чего другие процессы перечитают их не позже
+        чем через QUOTES_QUOTE_CACHE_LOCAL_TTL секунд.
+        """
+        with self._lock:
+            for quote_id in quote_ids:
+                self._local.pop(quote_id, None)
+        for quote_id in quote_ids:
+            try:
+                self.shared.incr(VERSION_KEY.format(quote_id=quote_id))
+            except ValueError:
+                # Версии нет в кэше: следующее чтение начнет новую
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def render(self):
+        """
+        Возвращает счетчики попаданий и промахов в текстовом формате
+        Prometheus.
+        """
+        name = 'quotes_quote_cache_requests_total'
+        lines = [
+            f'# HELP {name} Обращения к кэшу цитат по результату',
+            f'# TYPE {name} counter',
+        ]
+        with self._lock:
+            for result in RESULTS:
+                lines.append(
+                    f'{name}{{result="{result}"}} {self.stats[result]}'
+                )
+            lines.extend([
+                '# HELP quotes_quote_cache_size Цитат в памяти процесса',
+                '# TYPE quotes_quote_cache_size gauge',
+                f'quotes_quote_cache_size {len(self._local)}',
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+quote_cache = QuoteCache()
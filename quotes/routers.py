@@ -0,0 +1,112 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+# Cookie «читать с основной базы» ставится после записи пользователя
+PRIMARY_COOKIE = 'quotes_read_primary'
+
+_use_replica = ContextVar('quotes_use_replica', default=False)
+
+
+def replica_alias():
+    """
+    Псевдоним реплики или None, если реплика не настроена.
+    """
+    alias = getattr(settings, 'QUOTES_REPLICA_ALIAS', None)
+    return alias if alias in settings.DATABASES else None
+
+
+class ReplicaRouter:
+    """
+    Направляет чтения моделей приложения quotes на реплику внутри
+    представлений, помеченных read_replica. Все записи и остальные
+    чтения идут в основную базу, миграции к реплике не применяются:
+    ее копирует команда sync_replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'quotes' and _use_replica.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            return False
+        return None
+
+
+def reading_replica():
+    """
+    Читает ли текущий запрос цитаты с реплики.
+    """
+    return _use_replica.get()
+
+
+@contextmanager
+def primary_reads():
+    """
+    Внутри блока чтения идут в основную базу. Им заполняются общие
+    кэши с версионными ключами: данные отстающей реплики, сохраненные
+    под новой версией, остались бы в кэше до конца его срока жизни.
+    """
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _should_use_replica(request):
+    return (
+        replica_alias() is not None
+        and PRIMARY_COOKIE not in request.COOKIES
+    )
+
+
+def read_replica(view):
+    """
+    Декоратор представления, которое только читает цитаты: запросы
+    выполняются на реплике. Пользователь, который недавно что-то
+    записал (есть cookie PRIMARY_COOKIE), читает основную базу.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _use_replica.set(_should_use_replica(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _use_replica.set(_should_use_replica(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+def read_your_writes(response):
+    """
+    Помечает ответ на запись: следующие QUOTES_REPLICA_LAG секунд
+    пользователь читает основную базу и видит свои изменения.
+    """
+    if replica_alias() is not None:
+        response.set_cookie(
+            PRIMARY_COOKIE, '1',
+            max_age=getattr(settings, 'QUOTES_REPLICA_LAG', 30),
+            httponly=True, samesite='Lax',
+        )
+    return response
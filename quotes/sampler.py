@@ -0,0 +1,252 @@
+import bisect
+import random
+import threading
+import time
+from array import array
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .models import Quote
+
+
+def index_expired(built_at):
+    refresh = getattr(settings, 'QUOTES_INDEX_REFRESH', 300)
+    return time.monotonic() - built_at >= refresh
+
+
+def start_rebuild(target, name):
+    """
+    Запускает плановую перестройку индекса в фоновом потоке. Пока она
+    идет, запросы пользуются прежним индексом.
+    """
+    def run():
+        try:
+            target()
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+
+
+class WeightedSampler:
+    """
+    Индекс для взвешенного случайного выбора цитат.
+    Хранит id цитат и накопленные веса в компактных массивах,
+    выбор выполняется бинарным поиском за O(log n). Индекс
+    перестраивается раз в QUOTES_INDEX_REFRESH секунд, чтобы учесть
+    изменения, сделанные другими процессами. Плановая перестройка идет
+    в фоновом потоке, готовые массивы подменяются целиком; синхронно
+    строится только отсутствующий индекс.
+
+    Выбор берет готовый id из пула заранее выбранных цитат. Пул
+    размером QUOTES_SAMPLE_POOL_SIZE заполняется одним вызовом
+    random.choices в фоновом потоке, когда в нем остается меньше
+    QUOTES_SAMPLE_POOL_LOW_WATER id. При изменении индекса пул
+    заменяется пустым.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+        self._cumulative = None
+        self._built_at = 0
+        self._pool = deque()
+        self._refill_wanted = threading.Event()
+        self._refill_thread = None
+        self._build_lock = threading.Lock()
+        self._epoch = 0
+        self._rebuilding = False
+        self._added = None
+
+    @staticmethod
+    def _load():
+        """
+        Загружает из базы данных массивы id и накопленных весов.
+        """
+        ids = array('q')
+        cumulative = array('q')
+        total = 0
+        rows = (
+            Quote.objects.filter(weight__gt=0)
+            .order_by('id')
+            .values_list('id', 'weight')
+            .iterator(chunk_size=2000)
+        )
+        for quote_id, weight in rows:
+            total += weight
+            ids.append(quote_id)
+            cumulative.append(total)
+        return ids, cumulative
+
+    def _build(self):
+        """
+        Строит индекс вне блокировки выбора и подменяет им прежний.
+        Цитаты, добавленные во время загрузки, дописываются в новый
+        индекс; если индекс за это время сбросили, результат
+        отбрасывается. Вызывается под блокировкой _build_lock.
+        """
+        with self._lock:
+            epoch = self._epoch
+            self._added = []
+        try:
+            ids, cumulative = self._load()
+        finally:
+            with self._lock:
+                added, self._added = self._added, None
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            for quote_id, weight in added:
+                if not ids or quote_id > ids[-1]:
+                    ids.append(quote_id)
+                    cumulative.append(
+                        (cumulative[-1] if cumulative else 0) + weight
+                    )
+            self._ids = ids
+            self._cumulative = cumulative
+            self._pool = deque()
+            self._built_at = time.monotonic()
+
+    def _build_missing(self):
+        with self._build_lock:
+            if self._ids is None:
+                self._build()
+
+    def _rebuild(self):
+        try:
+            with self._build_lock:
+                self._build()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def __len__(self):
+        """
+        Количество цитат в построенном индексе.
+        """
+        return len(self._ids or ())
+
+    def _snapshot(self):
+        """
+        Возвращает построенный индекс (ids, cumulative, pool) или None,
+        если его нет. Устаревший индекс возвращается как есть, а его
+        перестройка запускается в фоне. Базу данных не читает.
+        """
+        with self._lock:
+            if self._ids is None:
+                return None
+            if index_expired(self._built_at) and not self._rebuilding:
+                self._rebuilding = True
+                start_rebuild(self._rebuild, 'quotes-sampler-rebuild')
+            return self._ids, self._cumulative, self._pool
+
+    def _choose(self, snapshot):
+        ids, cumulative, pool = snapshot
+        if not ids:
+            return None
+        try:
+            quote_id = pool.popleft()
+        except IndexError:
+            quote_id = None
+        if len(pool) < getattr(settings, 'QUOTES_SAMPLE_POOL_LOW_WATER', 250):
+            self._request_refill()
+        if quote_id is not None:
+            return quote_id
+        point = random.randrange(cumulative[-1])
+        return ids[bisect.bisect_right(cumulative, point)]
+
+    def sample(self):
+        """
+        Возвращает id случайной цитаты с учетом веса или None,
+        если цитат нет.
+        """
+        while True:
+            snapshot = self._snapshot()
+            if snapshot is not None:
+                return self._choose(snapshot)
+            # Индекса нет или его сбросили сразу после построения
+            self._build_missing()
+
+    def _request_refill(self):
+        if getattr(settings, 'QUOTES_SAMPLE_POOL_SIZE', 1000) <= 0:
+            return
+        self._refill_wanted.set()
+        thread = self._refill_thread
+        if thread is None or not thread.is_alive():
+            with self._lock:
+                thread = self._refill_thread
+                if thread is None or not thread.is_alive():
+                    self._refill_thread = threading.Thread(
+                        target=self._refill_loop,
+                        name='quotes-sample-pool',
+                        daemon=True,
+                    )
+                    self._refill_thread.start()
+
+    def _refill_loop(self):
+        """
+        Дополняет пул до QUOTES_SAMPLE_POOL_SIZE одной пачкой выборов.
+        Пачка строится под блокировкой, чтобы индекс не поменялся
+        посреди выбора.
+        """
+        while True:
+            self._refill_wanted.wait()
+            self._refill_wanted.clear()
+            with self._lock:
+                if not self._ids:
+                    continue
+                missing = (
+                    getattr(settings, 'QUOTES_SAMPLE_POOL_SIZE', 1000)
+                    - len(self._pool)
+                )
+                if missing > 0:
+                    self._pool.extend(random.choices(
+                        self._ids, cum_weights=self._cumulative, k=missing
+                    ))
+
+    async def asample(self):
+        """
+        Асинхронный вариант sample. В цикле событий индекс только
+        читается под блокировкой; если его нет, выбор с построением
+        выполняется в потоке.
+        """
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return await sync_to_async(self.sample)()
+        return self._choose(snapshot)
+
+    def add(self, quote_id, weight):
+        """
+        Добавляет новую цитату в конец индекса без полной перестройки.
+        """
+        with self._lock:
+            if weight <= 0:
+                return
+            if self._added is not None:
+                self._added.append((quote_id, weight))
+            if self._ids is None:
+                return
+            if self._ids and quote_id <= self._ids[-1]:
+                self._ids = None
+                self._cumulative = None
+                return
+            total = self._cumulative[-1] if self._cumulative else 0
+            self._ids.append(quote_id)
+            self._cumulative.append(total + weight)
+            self._pool = deque()
+
+    def invalidate(self):
+        """
+        Сбрасывает индекс, он будет перестроен при следующем выборе.
+        """
+        with self._lock:
+            self._epoch += 1
+            self._ids = None
+            self._cumulative = None
+            self._pool = deque()
+
+
+sampler = WeightedSampler()
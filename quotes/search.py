@@ -0,0 +1,95 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Quote
+
+FTS_TABLE = 'quotes_quote_fts'
+# Маркеры подсветки, которые не встречаются в тексте цитат
+MARK_START = '\x02'
+MARK_END = '\x03'
+SEARCH_FIELDS = ('id', 'text', 'source', 'type_of_source', 'likes')
+
+
+def build_match(query):
+    """
+    Превращает пользовательский запрос в выражение FTS5: каждое слово
+    ищется как префикс, все слова должны встретиться.
+    """
+    tokens = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _highlight(value):
+    """
+    Экранирует фрагмент и заменяет маркеры подсветки на <mark>.
+    """
+    return mark_safe(
+        escape(value)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def search_quotes(query, type_of_source=None, limit=20):
+    """
+    Ищет цитаты по тексту и источнику. Результаты упорядочены по BM25,
+    у каждого есть подсвеченные фрагменты text_snippet и
+    source_snippet.
+    """
+    match = build_match(query)
+    if not match:
+        return []
+    if connection.vendor != 'sqlite':
+        return _search_fallback(query, type_of_source, limit)
+
+    quote_table = connection.ops.quote_name(Quote._meta.db_table)
+    columns = ', '.join(f'q.{field}' for field in SEARCH_FIELDS)
+    sql = (
+        f'SELECT {columns}, '
+        f"snippet({FTS_TABLE}, 0, %s, %s, '…', 16), "
+        f"highlight({FTS_TABLE}, 1, %s, %s) "
+        f'FROM {FTS_TABLE} JOIN {quote_table} q ON q.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s'
+    )
+    params = [MARK_START, MARK_END, MARK_START, MARK_END, match]
+    if type_of_source:
+        sql += ' AND q.type_of_source = %s'
+        params.append(type_of_source)
+    sql += f' ORDER BY bm25({FTS_TABLE}, 1.0, 0.5) LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    results = []
+    for row in rows:
+        item = dict(zip(SEARCH_FIELDS, row))
+        item['text_snippet'] = _highlight(row[-2])
+        item['source_snippet'] = _highlight(row[-1])
+        results.append(item)
+    return results
+
+
+def _search_fallback(query, type_of_source, limit):
+    quotes = Quote.objects.filter(text__icontains=query)
+    if type_of_source:
+        quotes = quotes.filter(type_of_source=type_of_source)
+    results = []
+    for item in quotes.values(*SEARCH_FIELDS)[:limit]:
+        item['text_snippet'] = escape(item['text'])
+        item['source_snippet'] = escape(item['source'])
+        results.append(item)
+    return results
+
+
+def rebuild_index():
+    """
+    Перестраивает полнотекстовый индекс по всем цитатам.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+        )
@@ -0,0 +1,136 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils.timezone import now, timedelta
+
+from .dedup import text_hash
+from .models import Quote, QuoteVote
+
+User = get_user_model()
+
+# Доли типов источника в каталоге
+TYPE_SHARES = {
+    'film': 0.40,
+    'book': 0.25,
+    'series': 0.15,
+    'game': 0.12,
+    'comic': 0.08,
+}
+BATCH_SIZE = 10000
+
+
+def _insert_rows(model, fields, rows):
+    """
+    Вставляет строки пачками через executemany, минуя создание
+    объектов моделей.
+    """
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(
+        quote_name(model._meta.get_field(field).column) for field in fields
+    )
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = (
+        f'INSERT INTO {quote_name(model._meta.db_table)} ({columns}) '
+        f'VALUES ({placeholders})'
+    )
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def seed_database(total_quotes, total_votes=0, total_users=50, seed=0):
+    """
+    Заполняет пустую базу пользователями, цитатами и голосами.
+    Источники содержат от одной до трех цитат, типы распределены по
+    TYPE_SHARES, веса смещены к малым значениям, голоса распределены
+    по последним 30 дням. Счетчики лайков и дизлайков цитат
+    согласованы с таблицей голосов. Возвращает список пользователей.
+    """
+    rng = random.Random(seed)
+    adapt = connection.ops.adapt_datetimefield_value
+    started = now()
+    types = list(TYPE_SHARES)
+    shares = list(TYPE_SHARES.values())
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            User(username=f'bench_user_{i}') for i in range(total_users)
+        )
+        user_ids = [user.id for user in users]
+
+        def quote_rows():
+            source = 0
+            left_in_source = 0
+            source_type = types[0]
+            for i in range(total_quotes):
+                if not left_in_source:
+                    source += 1
+                    left_in_source = rng.choice((1, 2, 3))
+                    source_type = rng.choices(types, shares)[0]
+                left_in_source -= 1
+                yield (
+                    f'Цитата {i}',
+                    text_hash(f'Цитата {i}'),
+                    f'Произведение {source}',
+                    source_type,
+                    min(10, int(rng.expovariate(0.5)) + 1),
+                    0, 0, 0,
+                    rng.choice(user_ids[:10]),
+                    adapt(started - timedelta(minutes=total_quotes - i)),
+                )
+
+        _insert_rows(
+            Quote,
+            ('text', 'text_hash', 'source', 'type_of_source', 'weight',
+             'views', 'likes', 'dislikes', 'author', 'created_at'),
+            quote_rows(),
+        )
+        quote_ids = list(
+            Quote.objects.order_by('id').values_list('id', flat=True)
+        )
+        if not total_votes or not quote_ids:
+            return users
+
+        per_user = min(len(quote_ids), -(-total_votes // total_users))
+
+        def vote_rows():
+            produced = 0
+            for position, user_id in enumerate(user_ids):
+                offset = position * 7919
+                for k in range(per_user):
+                    if produced >= total_votes:
+                        return
+                    produced += 1
+                    yield (
+                        user_id,
+                        quote_ids[(offset + k) % len(quote_ids)],
+                        'like' if rng.random() < 0.7 else 'dislike',
+                        adapt(started - timedelta(
+                            seconds=rng.randrange(30 * 24 * 3600)
+                        )),
+                    )
+
+        _insert_rows(
+            QuoteVote, ('user', 'quote', 'vote_type', 'created_at'),
+            vote_rows(),
+        )
+        quote_table = connection.ops.quote_name(Quote._meta.db_table)
+        vote_table = connection.ops.quote_name(QuoteVote._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {quote_table} SET '
+                f'likes = (SELECT COUNT(*) FROM {vote_table} v '
+                f"WHERE v.quote_id = {quote_table}.id "
+                f"AND v.vote_type = 'like'), "
+                f'dislikes = (SELECT COUNT(*) FROM {vote_table} v '
+                f"WHERE v.quote_id = {quote_table}.id "
+                f"AND v.vote_type = 'dislike')"
+            )
+    return users
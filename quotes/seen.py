@@ -0,0 +1,142 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core import signing
+
+COOKIE_NAME = 'quotes_seen'
+COOKIE_SALT = 'quotes.seen'
+COOKIE_MAX_AGE = 30 * 24 * 60 * 60
+_MASK = (1 << 64) - 1
+
+
+class SeenQuotes:
+    """
+    Фильтр Блума по id цитат, которые посетитель уже видел. Занимает
+    QUOTES_SEEN_FILTER_BITS бит независимо от размера каталога и
+    хранится в подписанной сжатой cookie, а не в сессии: главная
+    страница не пишет в базу. Фильтр может изредка считать новую
+    цитату показанной, но никогда не пропустит показанную.
+    """
+    HASHES = 4
+
+    def __init__(self, data=None, count=0):
+        self.size = getattr(settings, 'QUOTES_SEEN_FILTER_BITS', 8192)
+        self.bits = bytearray(self.size // 8)
+        self.count = 0
+        self.changed = False
+        if data and len(data) == len(self.bits):
+            self.bits[:] = data
+            self.count = count
+
+    @classmethod
+    def from_request(cls, request):
+        stored = request.COOKIES.get(COOKIE_NAME)
+        if not stored:
+            return cls()
+        try:
+            data, count = signing.loads(
+                stored, salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE
+            )
+            return cls(base64.b64decode(data), int(count))
+        except (signing.BadSignature, binascii.Error, TypeError,
+                ValueError):
+            return cls()
+
+    def save(self, response):
+        """
+        Записывает фильтр в cookie ответа, если он изменился.
+        """
+        if not self.changed:
+            return
+        response.set_cookie(
+            COOKIE_NAME,
+            signing.dumps(
+                [base64.b64encode(self.bits).decode('ascii'), self.count],
+                salt=COOKIE_SALT,
+                compress=True,
+            ),
+            max_age=COOKIE_MAX_AGE,
+            httponly=True,
+            samesite='Lax',
+        )
+
+    @property
+    def capacity(self):
+        """
+        Сколько id можно добавить, пока доля ложных срабатываний
+        не превысит примерно 2,5%.
+        """
+        return self.size // 8
+
+    def _positions(self, quote_id):
+        first = (quote_id * 0x9E3779B97F4A7C15) & _MASK
+        second = ((quote_id ^ (first >> 29)) * 0xBF58476D1CE4E5B9) & _MASK
+        second |= 1
+        return [(first + i * second) % self.size for i in range(self.HASHES)]
+
+    def __contains__(self, quote_id):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(quote_id)
+        )
+
+    def add(self, quote_id):
+        for position in self._positions(quote_id):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+        self.changed = True
+
+    def clear(self):
+        if self.count:
+            self.changed = True
+        self.bits = bytearray(len(self.bits))
+        self.count = 0
+
+    def saturated(self, total):
+        """
+        Фильтр насыщен, если в нем столько id, сколько он вмещает,
+        или сколько всего цитат в каталоге (total, 0 — неизвестно).
+        """
+        return self.count >= self.capacity or 0 < total <= self.count
+
+
+def choose_unseen(seen, sample, total):
+    """
+    Выбирает id цитаты, которой нет в фильтре seen, вызывая sample
+    не больше QUOTES_SEEN_ATTEMPTS раз, и добавляет его в фильтр.
+    Если все попытки вернули показанные цитаты, фильтр сбрасывается.
+    Возвращает None, если цитат нет.
+    """
+    if seen.saturated(total):
+        seen.clear()
+    quote_id = None
+    for _ in range(getattr(settings, 'QUOTES_SEEN_ATTEMPTS', 10)):
+        quote_id = sample()
+        if quote_id is None:
+            return None
+        if quote_id not in seen:
+            break
+    else:
+        seen.clear()
+    seen.add(quote_id)
+    return quote_id
+
+
+async def achoose_unseen(seen, asample, total):
+    """
+    Асинхронный вариант choose_unseen.
+    """
+    if seen.saturated(total):
+        seen.clear()
+    quote_id = None
+    for _ in range(getattr(settings, 'QUOTES_SEEN_ATTEMPTS', 10)):
+        quote_id = await asample()
+        if quote_id is None:
+            return None
+        if quote_id not in seen:
+            break
+    else:
+        seen.clear()
+    seen.add(quote_id)
+    return quote_id
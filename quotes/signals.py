@@ -0,0 +1,201 @@
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_save,
+)
+from django.dispatch import receiver
+
+from .cards import bump_card_version
+from .dashboard import invalidate_dashboard
+from .dedup import index_quotes, text_hash
+from .leaderboard import leaderboards
+from .metrics import record_query
+from .models import Quote, QuoteVote
+from .quote_cache import quote_cache
+from .sampler import sampler
+from .source_index import source_index
+
+
+@receiver(post_save, sender=Quote)
+def update_sampler_on_save(sender, instance, created, update_fields=None,
+                           **kwargs):
+    """
+    Обновляет индекс случайного выбора при создании или изменении цитаты.
+    """
+    if created:
+        sampler.add(instance.id, instance.weight)
+    elif update_fields is None or 'weight' in update_fields:
+        sampler.invalidate()
+
+
+@receiver(post_delete, sender=Quote)
+def update_sampler_on_delete(sender, instance, **kwargs):
+    """
+    Сбрасывает индекс случайного выбора при удалении цитаты.
+    """
+    sampler.invalidate()
+
+
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+@receiver(post_save, sender=QuoteVote)
+@receiver(post_delete, sender=QuoteVote)
+def reset_dashboard(sender, **kwargs):
+    """
+    Сбрасывает снимок дашборда при изменении цитат или голосов.
+    """
+    invalidate_dashboard()
+
+
+@receiver(post_save, sender=Quote)
+def bump_card_on_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Сбрасывает кэш карточки цитаты при ее изменении. Просмотры
+    в карточку не входят.
+    """
+    if update_fields is None or set(update_fields) - {'views'}:
+        bump_card_version(instance.id)
+
+
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+def invalidate_quote_cache(sender, instance, **kwargs):
+    """
+    Сбрасывает цитату в кэше объектов при изменении или удалении.
+    """
+    quote_cache.invalidate(instance.id)
+
+
+@receiver(post_init, sender=Quote)
+def remember_source(sender, instance, **kwargs):
+    """
+    Запоминает исходные тип и источник цитаты, чтобы при сохранении
+    обновить индекс источников. Поля читаются из __dict__: у цитат
+    с отложенными полями чтение атрибута выполнило бы запрос; для них
+    исходный источник неизвестен (None).
+    """
+    current = (
+        instance.__dict__.get('type_of_source'),
+        instance.__dict__.get('source'),
+    )
+    instance._indexed_source = (
+        current if instance.pk and None not in current else None
+    )
+
+
+@receiver(post_save, sender=Quote)
+def update_leaderboards_on_save(sender, instance, **kwargs):
+    """
+    Обновляет рейтинги цитат при создании или изменении цитаты.
+    Вызывается до обновления индекса источников, пока сохранен
+    исходный тип цитаты.
+    """
+    previous = getattr(instance, '_indexed_source', None)
+    leaderboards.record_quote(
+        instance.id,
+        instance.type_of_source,
+        instance.likes,
+        previous_type=previous[0] if previous else None,
+    )
+
+
+@receiver(post_save, sender=Quote)
+def update_source_index_on_save(sender, instance, created, **kwargs):
+    """
+    Обновляет индекс источников при создании или изменении цитаты.
+    """
+    current = (instance.type_of_source, instance.source)
+    previous = getattr(instance, '_indexed_source', None)
+    if not created and previous is None:
+        source_index.invalidate()
+    elif previous != current:
+        if previous is not None:
+            source_index.remove(*previous)
+        source_index.add(*current)
+    instance._indexed_source = current
+
+
+@receiver(post_delete, sender=Quote)
+def update_source_index_on_delete(sender, instance, **kwargs):
+    """
+    Удаляет источник цитаты из индекса при удалении цитаты.
+    """
+    previous = getattr(instance, '_indexed_source', None)
+    if previous is None:
+        source_index.invalidate()
+    else:
+        source_index.remove(*previous)
+
+
+@receiver(post_delete, sender=Quote)
+def update_leaderboards_on_delete(sender, instance, **kwargs):
+    """
+    Удаляет цитату из рейтингов при удалении цитаты.
+    """
+    leaderboards.remove_quote(instance.id)
+
+
+@receiver(pre_save, sender=Quote)
+def set_text_hash(sender, instance, **kwargs):
+    """
+    Вычисляет хэш нормализованного текста перед сохранением цитаты.
+    """
+    if 'text' not in instance.get_deferred_fields():
+        instance.text_hash = text_hash(instance.text)
+
+
+@receiver(post_init, sender=Quote)
+def remember_text_hash(sender, instance, **kwargs):
+    """
+    Запоминает исходный хэш текста, чтобы пересчитывать корзины LSH
+    только при изменении текста.
+    """
+    instance._indexed_hash = (
+        instance.__dict__.get('text_hash') if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Quote)
+def update_buckets_on_save(sender, instance, **kwargs):
+    """
+    Обновляет корзины LSH цитаты при создании или изменении текста.
+    """
+    current = instance.__dict__.get('text_hash')
+    if current and instance._indexed_hash != current:
+        index_quotes([instance])
+        instance._indexed_hash = current
+
+
+SQLITE_PRAGMAS = (
+    'journal_mode', 'busy_timeout', 'synchronous', 'cache_size',
+    'mmap_size',
+)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Применяет к новому соединению с SQLite прагмы из настройки
+    QUOTES_SQLITE_PRAGMAS.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'QUOTES_SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if name not in SQLITE_PRAGMAS:
+                raise ValueError(f'Неизвестная прагма SQLite: {name}')
+            if not re.fullmatch(r'-?\w+', str(value)):
+                raise ValueError(f'Неверное значение прагмы {name}: {value}')
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Подключает учет SQL-запросов для метрик к новому соединению.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.db.models import Count
+
+from .models import Quote
+from .sampler import index_expired, start_rebuild
+
+
+class RandomSet:
+    """
+    Множество с добавлением, удалением и случайным выбором за O(1).
+    """
+
+    def __init__(self):
+        self._items = []
+        self._positions = {}
+
+    def add(self, item):
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def remove(self, item):
+        position = self._positions.pop(item, None)
+        if position is None:
+            return
+        last = self._items.pop()
+        if position < len(self._items):
+            self._items[position] = last
+            self._positions[last] = position
+
+    def choice(self):
+        return random.choice(self._items) if self._items else None
+
+
+class SourceIndex:
+    """
+    Индекс различных источников по типам. Для каждого типа и для всех
+    цитат сразу хранит множество источников, из которого случайный
+    источник выбирается за O(1) без запроса DISTINCT по таблице.
+    Как и индекс весов, периодически перестраивается из базы данных
+    в фоновом потоке; изменения, сделанные во время перестройки,
+    применяются к новому индексу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = None
+        self._by_type = None
+        self._built_at = 0
+        self._build_lock = threading.Lock()
+        self._epoch = 0
+        self._rebuilding = False
+        self._changes = None
+
+    @staticmethod
+    def _load():
+        """
+        Загружает индекс одним запросом с группировкой по типу
+        и источнику. Возвращает пару (counts, by_type).
+        """
+        counts = Counter()
+        by_type = {}
+        rows = (
+            Quote.objects.order_by()
+            .values_list('type_of_source', 'source')
+            .annotate(total=Count('id'))
+        )
+        for type_of_source, source, total in rows:
+            SourceIndex._add(counts, by_type, type_of_source, source, total)
+        return counts, by_type
+
+    def _build(self):
+        """
+        Строит индекс вне блокировки выбора и подменяет им прежний.
+        Вызывается под блокировкой _build_lock.
+        """
+        with self._lock:
+            epoch = self._epoch
+            self._changes = []
+        try:
+            counts, by_type = self._load()
+        finally:
+            with self._lock:
+                changes, self._changes = self._changes, None
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            for change, type_of_source, source in changes:
+                change(counts, by_type, type_of_source, source)
+            self._counts = counts
+            self._by_type = by_type
+            self._built_at = time.monotonic()
+
+    def _build_missing(self):
+        with self._build_lock:
+            if self._counts is None:
+                self._build()
+
+    def _rebuild(self):
+        try:
+            with self._build_lock:
+                self._build()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    @staticmethod
+    def _add(counts, by_type, type_of_source, source, count=1):
+        for key in ((type_of_source, source), (None, source)):
+            counts[key] += count
+            by_type.setdefault(key[0], RandomSet()).add(source)
+
+    @staticmethod
+    def _remove(counts, by_type, type_of_source, source):
+        for key in ((type_of_source, source), (None, source)):
+            if key not in counts:
+                # Изменение уже учтено загрузкой из базы
+                continue
+            counts[key] -= 1
+            if counts[key] <= 0:
+                del counts[key]
+                by_type[key[0]].remove(source)
+
+    def _apply(self, change, type_of_source, source):
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((change, type_of_source, source))
+            if self._counts is not None:
+                change(self._counts, self._by_type, type_of_source, source)
+
+    def random_source(self, type_of_source=None):
+        """
+        Возвращает случайный источник (с учетом фильтра по типу)
+        или None, если подходящих цитат нет.
+        """
+        while True:
+            self._build_missing()
+            with self._lock:
+                if self._counts is None:
+                    # Индекс сбросили сразу после построения
+                    continue
+                if index_expired(self._built_at) and not self._rebuilding:
+                    self._rebuilding = True
+                    start_rebuild(self._rebuild, 'quotes-source-rebuild')
+                sources = self._by_type.get(type_of_source)
+                return sources.choice() if sources else None
+
+    def add(self, type_of_source, source):
+        self._apply(self._add, type_of_source, source)
+
+    def remove(self, type_of_source, source):
+        self._apply(self._remove, type_of_source, source)
+
+    def invalidate(self):
+        with self._lock:
+            self._epoch += 1
+            self._counts = None
+            self._by_type = None
+
+
+source_index = SourceIndex()
@@ -0,0 +1,554 @@
+import json
+import tempfile
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from django.utils.html import escape
+
+from .api import encode_cursor
+from .checks import check_vote_log_cache
+from .dedup import text_hash
+from .forms import QuoteForm
+from .leaderboard import VERSION_KEY, Leaderboards, leaderboards
+from .models import (
+    MAX_QUOTES_PER_SOURCE, SOURCE_LIMIT_MESSAGE, Quote, QuoteVote, SourceQuota,
+)
+from .query_plans import find_full_scans
+from .sampler import WeightedSampler, sampler
+from .seeding import seed_database
+from .seen import COOKIE_NAME
+from .source_index import SourceIndex, source_index
+from .view_counter import ViewCountBuffer, view_counter
+from .vote_log import fold_events, log_vote
+from .voting import AlreadyVoted, cast_vote
+
+
+def run_in_threads(target, args_list):
+    """
+    Запускает target в отдельном потоке для каждого набора аргументов
+    и возвращает исключения, выброшенные в потоках.
+    """
+    errors = []
+    barrier = threading.Barrier(len(args_list))
+
+    def worker(*args):
+        try:
+            barrier.wait()
+            target(*args)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, args=args) for args in args_list
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class SearchTests(TestCase):
+    """
+    Полнотекстовый поиск видит созданные и измененные цитаты: триггеры
+    индекса FTS5 переживают миграции, пересоздающие quotes_quote.
+    """
+
+    def test_created_quote_is_found(self):
+        Quote.objects.create(text='Вопрос жизни и смерти', source='Гамлет')
+        response = self.client.get(reverse('search'), {'q': 'вопрос'})
+        self.assertContains(response, '<mark>Вопрос</mark> жизни')
+
+    def test_edited_quote_is_found_by_new_text(self):
+        quote = Quote.objects.create(text='Старый текст', source='Книга')
+        quote.text = 'Совершенно новая формулировка'
+        quote.save()
+        response = self.client.get(reverse('search'), {'q': 'формулировка'})
+        self.assertContains(response, '<mark>формулировка</mark>')
+        response = self.client.get(reverse('search'), {'q': 'старый'})
+        self.assertNotContains(response, 'Старый текст')
+
+    def test_api_search(self):
+        quote = Quote.objects.create(text='question of taste', source='X')
+        response = self.client.get(reverse('api_search'), {'q': 'question'})
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']], [quote.id]
+        )
+
+
+class DuplicateQuoteTests(TestCase):
+    """
+    Форма отклоняет точные (с точностью до регистра и пунктуации)
+    и почти точные повторы существующей цитаты.
+    """
+
+    TEXT = (
+        'Не тот велик, кто никогда не падал, а тот велик, '
+        'кто падал и вставал'
+    )
+
+    def setUp(self):
+        Quote.objects.create(text=self.TEXT, source='Конфуций')
+
+    def form(self, text):
+        return QuoteForm({
+            'text': text,
+            'source': 'Другой источник',
+            'weight': 1,
+            'type_of_source': 'book',
+        })
+
+    def test_text_hash_ignores_case_and_punctuation(self):
+        self.assertEqual(
+            text_hash(self.TEXT), text_hash(self.TEXT.upper() + '!!')
+        )
+
+    def test_exact_duplicate_is_rejected(self):
+        form = self.form('  ' + self.TEXT.upper() + '!')
+        self.assertFalse(form.is_valid())
+        self.assertIn('Такая цитата уже существует.', form.errors['text'])
+
+    def test_near_duplicate_is_rejected(self):
+        form = self.form(self.TEXT + ' снова')
+        self.assertFalse(form.is_valid())
+        self.assertIn('Очень похожая цитата', form.errors['text'][0])
+
+    def test_unrelated_quote_is_accepted(self):
+        self.assertTrue(self.form('Рукописи не горят').is_valid())
+
+
+class DeferredQuoteTests(TestCase):
+    """
+    Загрузка цитат с отложенными полями не выполняет запрос на каждую
+    строку.
+    """
+
+    def test_only_does_not_load_deferred_fields(self):
+        for text in ('Один', 'Два', 'Три'):
+            Quote.objects.create(text=text, source=text)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(Quote.objects.only('id', 'text'))), 3)
+
+
+class ApiCursorTests(TestCase):
+    """
+    Курсор с значениями неверного типа отклоняется ошибкой 400.
+    """
+
+    def test_malformed_cursors(self):
+        cases = [
+            ('likes', ['abc', 1]),
+            ('likes', [[1], 1]),
+            ('likes', [True, 1]),
+            ('likes', [1, 'x']),
+            ('likes', [10 ** 30, 1]),
+            ('likes', [1, 10 ** 30]),
+            ('recent', ['2025-01-01T00:00:00+00:00', -10 ** 30]),
+            ('recent', [5, 1]),
+            ('recent', ['не дата', 1]),
+        ]
+        for order, (value, quote_id) in cases:
+            with self.subTest(order=order, value=value, quote_id=quote_id):
+                response = self.client.get(reverse('api_quote_list'), {
+                    'order': order,
+                    'cursor': encode_cursor(value, quote_id),
+                })
+                self.assertEqual(response.status_code, 400)
+
+    def test_valid_cursor(self):
+        response = self.client.get(reverse('api_quote_list'), {
+            'cursor': encode_cursor(10, 1),
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_quote_is_json_404(self):
+        response = self.client.get(reverse('api_quote_detail', args=[999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Цитата не найдена'})
+
+
+class LeaderboardTests(TestCase):
+    """
+    Смена голоса сбрасывает только рейтинг за неделю.
+    """
+
+    def test_switched_vote_reloads_only_weekly_ranking(self):
+        user = User.objects.create(username='voter')
+        quote = Quote.objects.create(text='Вторая', source='Y', likes=1)
+        vote = QuoteVote.objects.create(
+            user=user, quote=quote, vote_type='like'
+        )
+        boards = Leaderboards()
+        self.assertEqual(boards.top(window='week'), [(quote.id, 1)])
+        vote.vote_type = 'dislike'
+        vote.save()
+        Quote.objects.filter(id=quote.id).update(likes=0, dislikes=1)
+        boards.record_vote(
+            quote.id, quote.type_of_source, 0, 'dislike', changed=True
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(boards.top(), [(quote.id, 0)])
+        with self.assertNumQueries(1):
+            self.assertEqual(boards.top(window='week'), [])
+
+
+class VoteLogCacheTests(TestCase):
+    """
+    Сброс кэшей после переноса журнала голосов доходит до других
+    процессов только через общий кэш.
+    """
+
+    def test_leaderboard_invalidation_reaches_other_instances(self):
+        quote = Quote.objects.create(text='Первая', source='X')
+        worker, web = Leaderboards(), Leaderboards()
+        self.assertEqual(web.top(), [(quote.id, 0)])
+        Quote.objects.filter(id=quote.id).update(likes=5)
+        worker.invalidate()
+        self.assertEqual(web.top(), [(quote.id, 5)])
+
+    def test_fold_resets_leaderboards_only_when_a_top_changes(self):
+        first = User.objects.create(username='first')
+        second = User.objects.create(username='second')
+        top = [
+            Quote.objects.create(text=f'Топ {i}', source=f'T{i}', likes=5)
+            for i in range(10)
+        ]
+        QuoteVote.objects.bulk_create(
+            QuoteVote(user=first, quote=quote, vote_type='like')
+            for quote in top
+        )
+        outsider = Quote.objects.create(text='Снаружи', source='S')
+        leaderboards.invalidate()
+        version = cache.get(VERSION_KEY)
+
+        log_vote(second, outsider.id, 'like')
+        with self.captureOnCommitCallbacks(execute=True):
+            fold_events()
+        self.assertEqual(cache.get(VERSION_KEY), version)
+
+        log_vote(first, top[0].id, 'dislike')
+        with self.captureOnCommitCallbacks(execute=True):
+            fold_events()
+        self.assertNotEqual(cache.get(VERSION_KEY), version)
+        self.assertIn((outsider.id, 1), leaderboards.top(window='week'))
+
+    @override_settings(QUOTES_VOTE_LOG=True)
+    def test_vote_log_requires_shared_cache(self):
+        errors = check_vote_log_cache(None)
+        self.assertEqual([error.id for error in errors], ['quotes.E001'])
+
+    @override_settings(
+        QUOTES_VOTE_LOG=True,
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'quotes_cache',
+        }},
+    )
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_vote_log_cache(None), [])
+
+
+class QueryCountTests(TestCase):
+    """
+    Число запросов страниц не зависит от числа цитат на них: сессия,
+    пользователь и один запрос данных.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader')
+        self.client.force_login(self.user)
+        source_index.invalidate()
+
+    def create_quotes(self, count):
+        texts = ('Первая мысль', 'Вторая идея', 'Третий ответ')[:count]
+        quotes = [
+            Quote.objects.create(
+                text=text, source='Один источник', author=self.user
+            )
+            for text in texts
+        ]
+        for quote in quotes:
+            cast_vote(self.user, quote.id, 'like')
+        return quotes
+
+    def assert_random_source_queries(self, count):
+        self.create_quotes(count)
+        # Первый запрос строит индекс источников
+        self.client.get(reverse('random_source_quotes'))
+        cache.clear()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('random_source_quotes'))
+        self.assertEqual(len(response.context['quotes']), count)
+
+    def assert_user_votes_queries(self, count):
+        quotes = self.create_quotes(count)
+        ids = ','.join(str(quote.id) for quote in quotes)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('user_votes'), {'ids': ids})
+        self.assertEqual(len(response.json()['votes']), count)
+
+    def test_random_source_one_quote(self):
+        self.assert_random_source_queries(1)
+
+    def test_random_source_three_quotes(self):
+        self.assert_random_source_queries(3)
+
+    def test_user_votes_one_quote(self):
+        self.assert_user_votes_queries(1)
+
+    def test_user_votes_three_quotes(self):
+        self.assert_user_votes_queries(3)
+
+
+class SeenQuotesTests(TestCase):
+    """
+    Показанные цитаты хранятся в cookie: главная страница не пишет
+    в сессию и не повторяет цитаты посетителю.
+    """
+
+    def setUp(self):
+        view_counter.clear()
+        sampler.invalidate()
+
+    def tearDown(self):
+        view_counter.clear()
+        sampler.invalidate()
+
+    def test_anonymous_visits_do_not_touch_sessions(self):
+        Quote.objects.create(text='Единственная', source='S')
+        for _ in range(3):
+            client = Client()
+            client.get(reverse('random_quote'))
+            client.get(reverse('random_quote'))
+        self.assertFalse(Session.objects.exists())
+
+    def test_quotes_are_not_repeated(self):
+        for text in ('Одна', 'Две', 'Три'):
+            Quote.objects.create(text=text, source=text)
+        shown = {
+            self.client.get(reverse('random_quote')).context['quote'].id
+            for _ in range(3)
+        }
+        self.assertEqual(len(shown), 3)
+        self.assertIn(COOKIE_NAME, self.client.cookies)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Запросы представлений не читают таблицы приложения полным
+    сканированием и не сортируют их строки во временном B-дереве
+    (то же, что команда check_query_plans).
+    """
+
+    def setUp(self):
+        view_counter.clear()
+
+    def tearDown(self):
+        view_counter.clear()
+        sampler.invalidate()
+        source_index.invalidate()
+
+    def test_no_full_scans(self):
+        user = seed_database(3000, 10000, 50)[0]
+        self.assertEqual(find_full_scans(user), [])
+
+
+class ImportQuotesTests(TestCase):
+    """
+    Импорт отклоняет строки неверной структуры, не прерываясь.
+    """
+
+    def test_malformed_rows_are_rejected(self):
+        rows = [
+            {'text': 'Нулевой вес', 'source': 'A', 'weight': 0},
+            ['не', 'объект'],
+            {'text': ['список'], 'source': 'B'},
+            {'text': 'Текст', 'source': 7},
+            {'text': 'Вес по умолчанию', 'source': 'C', 'weight': ''},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'quotes.jsonl'
+            path.write_text(
+                '\n'.join(json.dumps(row) for row in rows), encoding='utf-8'
+            )
+            call_command('import_quotes', str(path), stdout=StringIO())
+            rejects = [
+                json.loads(line)['line'] for line in
+                Path(f'{path}.rejects.jsonl').read_text().splitlines()
+            ]
+        self.assertEqual(rejects, [2, 3, 4])
+        self.assertEqual(
+            dict(Quote.objects.values_list('source', 'weight')),
+            {'A': 0, 'C': 1},
+        )
+
+
+class ConcurrentVotingTests(TransactionTestCase):
+    """
+    Параллельные голоса из разных потоков не теряют обновлений
+    счетчиков.
+    """
+
+    def test_counters_match_votes(self):
+        quotes = [
+            Quote.objects.create(text=f'Цитата {name}', source=name)
+            for name in ('Альфа', 'Бета', 'Гамма')
+        ]
+        users = [User.objects.create(username=f'u{i}') for i in range(8)]
+
+        def vote_all(user, sequence):
+            for quote in quotes:
+                for vote_type in sequence:
+                    try:
+                        cast_vote(user, quote.id, vote_type)
+                    except AlreadyVoted:
+                        pass
+
+        sequences = (
+            ['like'], ['dislike'], ['like', 'dislike'],
+            ['dislike', 'like', 'like'],
+        )
+        errors = run_in_threads(vote_all, [
+            (user, sequences[i % len(sequences)])
+            for i, user in enumerate(users)
+        ])
+        self.assertEqual(errors, [])
+        for quote in quotes:
+            quote.refresh_from_db()
+            votes = QuoteVote.objects.filter(quote=quote)
+            self.assertEqual(
+                (quote.likes, quote.dislikes),
+                (
+                    votes.filter(vote_type='like').count(),
+                    votes.filter(vote_type='dislike').count(),
+                ),
+            )
+            self.assertEqual(votes.count(), len(users))
+
+
+class ConcurrentAddQuoteTests(TransactionTestCase):
+    """
+    Параллельные добавления цитат одного источника не превышают лимит.
+    """
+
+    TEXTS = (
+        'Кто владеет информацией, тот владеет миром',
+        'Рукописи не горят',
+        'Все счастливые семьи похожи друг на друга',
+        'Я мыслю, следовательно, существую',
+        'Красота спасет мир',
+        'Не тот велик, кто никогда не падал',
+    )
+
+    def test_source_limit_holds(self):
+        rejected = []
+
+        def post(text):
+            response = Client().post(reverse('add_quote'), {
+                'text': text,
+                'source': 'Сборник (2000)',
+                'weight': 1,
+                'type_of_source': 'book',
+            })
+            if response.status_code == 200:
+                rejected.append(response)
+
+        errors = run_in_threads(post, [(text,) for text in self.TEXTS])
+        self.assertEqual(errors, [])
+        # Отказ проверки формы и отказ базы выглядят одинаково
+        message = SOURCE_LIMIT_MESSAGE.format(
+            source='Сборник (2000)', limit=MAX_QUOTES_PER_SOURCE
+        )
+        self.assertEqual(
+            len(rejected), len(self.TEXTS) - MAX_QUOTES_PER_SOURCE
+        )
+        for response in rejected:
+            self.assertContains(response, escape(message))
+        self.assertEqual(
+            Quote.objects.filter(source='Сборник (2000)').count(),
+            MAX_QUOTES_PER_SOURCE,
+        )
+        self.assertEqual(
+            SourceQuota.objects.get(source='Сборник (2000)').quotes,
+            MAX_QUOTES_PER_SOURCE,
+        )
+
+
+class ViewCounterTests(TransactionTestCase):
+    """
+    Поток буфера просмотров записывает их по интервалу, даже если
+    новых просмотров больше нет.
+    """
+
+    @override_settings(QUOTES_VIEW_BUFFER_INTERVAL=0.05)
+    def test_idle_buffer_is_flushed(self):
+        quote = Quote.objects.create(text='Просмотренная', source='V')
+        buffer = ViewCountBuffer()
+        buffer.add(quote.id, 2)
+        buffer.start_flusher()
+        try:
+            deadline = time.monotonic() + 5
+            while buffer.pending(quote.id) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            buffer.stop_flusher()
+        quote.refresh_from_db()
+        self.assertEqual(quote.views, 2)
+
+
+class IndexRebuildTests(TransactionTestCase):
+    """
+    Устаревшие индексы в памяти перестраиваются в фоне: запрос
+    получает ответ по прежнему индексу без обращения к базе.
+    """
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    @override_settings(QUOTES_INDEX_REFRESH=3600, QUOTES_SAMPLE_POOL_SIZE=0)
+    def test_expired_indexes_rebuild_in_background(self):
+        first = Quote.objects.create(text='Первая', source='Раз')
+        index, sources = WeightedSampler(), SourceIndex()
+        self.assertEqual(index.sample(), first.id)
+        self.assertEqual(sources.random_source(), 'Раз')
+        Quote.objects.filter(id=first.id).update(source='Два', weight=0)
+        second = Quote.objects.create(text='Вторая', source='Два')
+
+        with override_settings(QUOTES_INDEX_REFRESH=0):
+            with self.assertNumQueries(0):
+                self.assertEqual(index.sample(), first.id)
+                self.assertEqual(sources.random_source(), 'Раз')
+            self.wait_until(lambda: not index._rebuilding)
+            self.wait_until(lambda: not sources._rebuilding)
+        self.assertEqual(index.sample(), second.id)
+        self.assertEqual(sources.random_source(), 'Два')
+
+
+class AsyncSampleTests(TestCase):
+    """
+    Асинхронный выбор не обращается к базе в цикле событий:
+    отсутствующий или сброшенный индекс строится в потоке.
+    """
+
+    async def test_asample_never_builds_on_event_loop(self):
+        quote = await Quote.objects.acreate(text='Асинхронная', source='A')
+        index = WeightedSampler()
+        self.assertEqual(await index.asample(), quote.id)
+        index.invalidate()
+        self.assertEqual(await index.asample(), quote.id)
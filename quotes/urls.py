@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.contrib.auth import views as auth_views
 from django.urls import path
 
-from . import views
+from . import api, views
+
+# Под ASGI самые нагруженные страницы обслуживаются асинхронными версиями
+if settings.QUOTES_ASYNC_VIEWS:
+    from . import async_views as hot_views
+else:
+    hot_views = views
 
 urlpatterns = [
-    path('', views.random_quote, name='random_quote'),
+    path('', hot_views.random_quote, name='random_quote'),
     path('add/', views.add_quote, name='add_quote'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/data/', views.dashboard_data, name='dashboard_data'),
     path('login/', auth_views.LoginView.as_view(
         template_name='quotes/login.html'), name='login'
     ),
@@ -15,7 +23,24 @@ urlpatterns = [
          views.random_source_quotes,
          name='random_source_quotes'),
     path('register/', views.register, name='register'),
-    path('top/', views.top_quotes, name='top_quotes'),
-    path('vote/<int:quote_id>/<str:vote_type>/', views.vote, name='vote'),
+    path('top/', hot_views.top_quotes, name='top_quotes'),
+    path('vote/<int:quote_id>/<str:vote_type>/',
+         hot_views.vote,
+         name='vote'),
+    path('votes/', views.user_votes, name='user_votes'),
     path('edit/<int:quote_id>/', views.edit_quote, name='edit_quote'),
+    path('api/quotes/', api.quote_list, name='api_quote_list'),
+    path('api/quotes/<int:quote_id>/',
+         api.quote_detail,
+         name='api_quote_detail'),
+    path('api/sources/<path:source>/',
+         api.quotes_by_source,
+         name='api_quotes_by_source'),
+    path('api/top/', api.top, name='api_top'),
+    path('api/search/', api.search, name='api_search'),
+    path('search/', views.search, name='search'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('export/<str:model_name>/',
+         views.export_data,
+         name='export_data'),
 ]
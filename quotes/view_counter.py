@@ -0,0 +1,222 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+from .models import Quote
+from .quote_cache import quote_cache
+from .write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCountBuffer:
+    """
+    Буфер просмотров цитат. Копит приращения в памяти процесса и
+    записывает их пачкой запросов вида views = F('views') + n,
+    когда набирается заданное количество просмотров или истекает
+    интервал. В процессе сервера интервал отсчитывает фоновый поток
+    (см. start), поэтому простаивающий процесс тоже записывает
+    просмотры.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._flusher = None
+        self._stopped = threading.Event()
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'QUOTES_VIEW_BUFFER_SIZE', 100)
+
+    @property
+    def max_interval(self):
+        return getattr(settings, 'QUOTES_VIEW_BUFFER_INTERVAL', 10)
+
+    @property
+    def spool_path(self):
+        return settings.QUOTES_VIEW_BUFFER_SPOOL
+
+    def start(self):
+        """
+        Подключает буфер к процессу сервера: запускает фоновую запись
+        по интервалу и запись остатка при завершении процесса.
+        Вызывается из wsgi.py и asgi.py, а не при импорте, чтобы тесты
+        и команды не писали просмотры при выходе.
+        """
+        if self.start_flusher():
+            atexit.register(self.shutdown)
+
+    def start_flusher(self):
+        """
+        Запускает поток, записывающий буфер по истечении интервала.
+        Возвращает False, если поток уже запущен.
+        """
+        with self._lock:
+            if self._flusher is not None:
+                return False
+            self._stopped.clear()
+            self._flusher = threading.Thread(
+                target=self._flush_periodically,
+                name='quotes-view-flusher',
+                daemon=True,
+            )
+            self._flusher.start()
+            return True
+
+    def stop_flusher(self):
+        with self._lock:
+            flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            self._stopped.set()
+            flusher.join()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.max_interval):
+            with self._lock:
+                due = (
+                    self._pending
+                    and time.monotonic() - self._last_flush
+                    >= self.max_interval
+                )
+            if not due:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать просмотры цитат')
+        connection.close()
+
+    def add(self, quote_id, count=1):
+        """
+        Учитывает просмотр цитаты и при достижении порога сбрасывает
+        буфер в базу данных.
+        """
+        if self._record(quote_id, count):
+            self.flush()
+
+    async def aadd(self, quote_id, count=1):
+        """
+        Асинхронный вариант add: запись в базу выполняется в потоке
+        только при достижении порога.
+        """
+        if self._record(quote_id, count):
+            await sync_to_async(self.flush)()
+
+    def _record(self, quote_id, count):
+        """
+        Учитывает просмотр в памяти и сообщает, пора ли сбросить буфер.
+        """
+        with self._lock:
+            self._counts[quote_id] += count
+            self._pending += count
+            return (
+                self._pending >= self.max_size
+                or time.monotonic() - self._last_flush >= self.max_interval
+            )
+
+    def pending(self, quote_id):
+        """
+        Возвращает количество еще не записанных просмотров цитаты.
+        """
+        with self._lock:
+            return self._counts.get(quote_id, 0)
+
+    def clear(self):
+        """
+        Отбрасывает накопленные просмотры без записи.
+        """
+        self._take()
+
+    def _take(self):
+        with self._lock:
+            counts = self._counts
+            self._counts = defaultdict(int)
+            self._pending = 0
+            self._last_flush = time.monotonic()
+        return counts
+
+    def _restore(self, counts):
+        with self._lock:
+            for quote_id, count in counts.items():
+                self._counts[quote_id] += count
+                self._pending += count
+
+    @staticmethod
+    def _write(counts):
+        """
+        Записывает приращения: один UPDATE на каждое различное значение n.
+        """
+        by_count = defaultdict(list)
+        for quote_id, count in counts.items():
+            by_count[count].append(quote_id)
+        with transaction.atomic():
+            for count, ids in by_count.items():
+                Quote.objects.filter(id__in=ids).update(
+                    views=F('views') + count
+                )
+
+    def flush(self):
+        """
+        Записывает накопленные просмотры в базу данных. Возвращает
+        количество записанных просмотров. При ошибке базы данных
+        приращения возвращаются в буфер.
+        """
+        counts = self._take()
+        if not counts:
+            return 0
+        try:
+            write_queue.run(self._write, counts)
+        except DatabaseError:
+            logger.exception('Не удалось записать просмотры цитат')
+            self._restore(counts)
+            return 0
+        quote_cache.invalidate(*counts)
+        return sum(counts.values())
+
+    def flush_spool(self):
+        """
+        Записывает в базу просмотры, сохраненные в файл при завершении
+        процесса. Возвращает количество записанных просмотров.
+        """
+        path = self.spool_path
+        try:
+            with open(path, encoding='utf-8') as spool:
+                lines = spool.readlines()
+        except FileNotFoundError:
+            return 0
+        counts = defaultdict(int)
+        for line in lines:
+            for quote_id, count in json.loads(line).items():
+                counts[int(quote_id)] += count
+        if counts:
+            self._write(counts)
+        open(path, 'w').close()
+        return sum(counts.values())
+
+    def shutdown(self):
+        """
+        Сбрасывает буфер при завершении процесса. Если база данных
+        недоступна, сохраняет приращения в файл, чтобы их записала
+        команда flush_views.
+        """
+        self.stop_flusher()
+        self.flush()
+        counts = self._take()
+        if not counts:
+            return
+        with open(self.spool_path, 'a', encoding='utf-8') as spool:
+            spool.write(json.dumps(counts) + '\n')
+
+
+view_counter = ViewCountBuffer()
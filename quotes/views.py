@@ -1,109 +1,123 @@
-import random
-
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.db import IntegrityError
-from django.db.models import Count, Sum
-from django.http import JsonResponse
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import render, redirect, get_object_or_404
-from django.utils.timezone import now, timedelta
-
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .cards import attach_card_versions
+from .dashboard import get_dashboard_snapshot
+from .export import (
+    EXPORT_FIELDS, export_lines, export_queryset, parse_export_date,
+)
 from .forms import QuoteForm, CustomUserCreationForm
-from .models import Quote, QuoteVote
-
-User = get_user_model()
-
-
+from .leaderboard import leaderboards
+from .metrics import registry
+from .models import Quote
+from .quote_cache import quote_cache
+from .routers import read_replica, read_your_writes
+from .sampler import sampler
+from .search import search_quotes
+from .seen import SeenQuotes, choose_unseen
+from .source_index import source_index
+from .view_counter import view_counter
+from .vote_log import log_vote, pending_votes
+from .voting import AlreadyVoted, cast_vote, get_user_votes
+
+
+@read_replica
 def random_quote(request):
     """
-    Возвращает случайную цитату с учетом веса. Увеличивает счетчик
-    просмотров и отображает статус голосования текущего пользователя.
+    Возвращает случайную цитату с учетом веса, по возможности еще не
+    показанную посетителю, и увеличивает счетчик просмотров. Голос
+    пользователя страница запрашивает через user_votes.
     """
-    quotes = list(Quote.objects.all())
-    if not quotes:
-        return render(request, 'quotes/quote.html', {'quote': None})
-
-    total_weight = sum(quote.weight for quote in quotes)
-    random_weight = random.uniform(0, total_weight)
-    upto = 0
-    for quote in quotes:
-        if upto + quote.weight >= random_weight:
-            selected = quote
+    seen = SeenQuotes.from_request(request)
+    selected = None
+    for _ in range(2):
+        quote_id = choose_unseen(seen, sampler.sample, len(sampler))
+        if quote_id is None:
             break
-        upto += quote.weight
-
-    selected.views += 1
-    selected.save()
-
-    user_vote = None
-    if request.user.is_authenticated:
-        try:
-            vote_obj = QuoteVote.objects.get(
-                user=request.user, quote=selected
-            )
-            user_vote = vote_obj.vote_type
-        except QuoteVote.DoesNotExist:
-            pass
+        selected = quote_cache.get(quote_id)
+        if selected is not None:
+            break
+        # Индекс устарел (цитату удалили в другом процессе)
+        sampler.invalidate()
+    if selected is not None:
+        selected.views += view_counter.pending(selected.id) + 1
+        view_counter.add(selected.id)
+        attach_card_versions([selected])
 
-    return render(
-        request,
-        'quotes/quote.html',
-        {'quote': selected, 'user_vote': user_vote},
-    )
+    response = render(request, 'quotes/quote.html', {'quote': selected})
+    seen.save(response)
+    return response
 
 
 @login_required
 def vote(request, quote_id, vote_type):
     """
     Обрабатывает голосование пользователя (лайк/дизлайк) по цитате.
+    Голос и счетчики цитаты сохраняются одной транзакцией, а при
+    включенной настройке QUOTES_VOTE_LOG голос добавляется в журнал
+    и возвращаются ожидаемые счетчики.
     """
-    quote = get_object_or_404(Quote, id=quote_id)
-
     if vote_type not in ['like', 'dislike']:
         return JsonResponse(
             {'error': 'Неверный тип голосования'}, status=400
         )
 
+    record_vote = log_vote if settings.QUOTES_VOTE_LOG else cast_vote
     try:
-        vote_obj, created = QuoteVote.objects.get_or_create(
-            user=request.user,
-            quote=quote,
-            defaults={'vote_type': vote_type},
-        )
-        if not created:
-            if vote_obj.vote_type == vote_type:
-                return JsonResponse(
-                    {'error': 'Вы уже голосовали этим способом'}, status=400
-                )
-            if vote_obj.vote_type == 'like':
-                quote.likes -= 1
-                quote.dislikes += 1
-            else:
-                quote.dislikes -= 1
-                quote.likes += 1
-            vote_obj.vote_type = vote_type
-            vote_obj.save()
-        else:
-            if vote_type == 'like':
-                quote.likes += 1
-            else:
-                quote.dislikes += 1
-        quote.save()
+        likes, dislikes = record_vote(request.user, quote_id, vote_type)
+    except AlreadyVoted:
         return JsonResponse(
-            {'likes': quote.likes, 'dislikes': quote.dislikes}
+            {'error': 'Вы уже голосовали этим способом'}, status=400
         )
     except IntegrityError:
         return JsonResponse(
             {'error': 'Ошибка при сохранении голосования'}, status=400
         )
+    return read_your_writes(
+        JsonResponse({'likes': likes, 'dislikes': dislikes})
+    )
 
 
+@read_replica
 def top_quotes(request):
     """
-    Возвращает 10 цитат с наибольшим количеством лайков.
+    Возвращает 10 цитат с наибольшим количеством лайков. Параметр type
+    фильтрует по типу источника, window=week выбирает лайки за
+    последние 7 дней.
     """
-    quotes = Quote.objects.order_by('-likes')[:10]
-    return render(request, 'quotes/top_quotes.html', {'quotes': quotes})
+    type_filter = request.GET.get('type')
+    if type_filter not in dict(Quote.TYPE_CHOICES):
+        type_filter = None
+    window = request.GET.get('window')
+    if window != 'week':
+        window = None
+
+    ranked = leaderboards.top(type_filter, window)
+    quotes_by_id = Quote.objects.in_bulk([quote_id for quote_id, _ in ranked])
+    quotes = []
+    for quote_id, score in ranked:
+        quote = quotes_by_id.get(quote_id)
+        if quote is not None:
+            quote.score = score
+            quotes.append(quote)
+    attach_card_versions(quotes)
+
+    context = {
+        'quotes': quotes,
+        'type_filter': type_filter,
+        'window': window,
+        'type_choices_sorted': sorted(Quote.TYPE_CHOICES, key=lambda x: x[1]),
+    }
+    return render(request, 'quotes/top_quotes.html', context)
 
 
 def add_quote(request):
@@ -116,8 +130,12 @@ def add_quote(request):
             quote = form.save(commit=False)
             if request.user.is_authenticated:
                 quote.author = request.user
-            quote.save()
-            return redirect('random_quote')
+            try:
+                quote.save()
+            except ValidationError as exc:
+                form.add_error(None, exc)
+            else:
+                return read_your_writes(redirect('random_quote'))
         return render(request, 'quotes/add_quote.html', {'form': form})
     else:
         form = QuoteForm()
@@ -138,23 +156,25 @@ def register(request):
     return render(request, 'quotes/register.html', {'form': form})
 
 
+@read_replica
 def random_source_quotes(request):
     """
     Возвращает цитаты случайного источника с фильтром по типу источника.
     """
     type_filter = request.GET.get('type')
     type_choices_sorted = sorted(Quote.TYPE_CHOICES, key=lambda x: x[1])
-    sources_qs = Quote.objects.all()
-    if type_filter:
-        sources_qs = sources_qs.filter(type_of_source=type_filter)
-
-    sources = sources_qs.values_list('source', flat=True).distinct()
-    if not sources:
-        quotes = []
-        source = None
-    else:
-        source = random.choice(list(sources))
-        quotes = Quote.objects.filter(source=source)
+    source = None
+    quotes = []
+    for _ in range(2):
+        source = source_index.random_source(type_filter or None)
+        if source is None:
+            break
+        quotes = list(Quote.objects.filter(source=source))
+        if quotes:
+            break
+        # Индекс устарел (цитаты источника удалили в другом процессе)
+        source_index.invalidate()
+    attach_card_versions(quotes)
 
     context = {
         'quotes': quotes,
@@ -166,7 +186,31 @@ def random_source_quotes(request):
     return render(request, 'quotes/quotes_by_source.html', context)
 
 
+def user_votes(request):
+    """
+    Возвращает голоса текущего пользователя за цитаты из параметра ids
+    (номера через запятую, не больше 100) одним запросом. Карточки
+    цитат кэшируются общими для всех, поэтому голос пользователя
+    страницы запрашивают отдельно.
+    """
+    try:
+        quote_ids = [
+            int(quote_id)
+            for quote_id in request.GET.get('ids', '').split(',')
+            if quote_id
+        ][:100]
+    except ValueError:
+        return JsonResponse({'error': 'Неверный список цитат'}, status=400)
+    votes = get_user_votes(request.user, quote_ids)
+    if settings.QUOTES_VOTE_LOG and request.user.is_authenticated:
+        votes.update(pending_votes(request.user, quote_ids))
+    response = JsonResponse({'votes': votes})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
+@read_replica
 def dashboard(request):
     """
     Отображает дашборд с графиками:
@@ -175,114 +219,69 @@ def dashboard(request):
     - Лайки/дизлайки за последние 7 дней
     - Круговые диаграммы просмотров и лайков
     - Топ авторы по количеству цитат
+    Данные графиков загружаются отдельно через dashboard_data.
     """
-    type_choices_dict = dict(Quote.TYPE_CHOICES)
+    return render(request, 'quotes/dashboard.html')
 
-    quotes_by_type = list(
-        Quote.objects.values('type_of_source').annotate(total=Count('id'))
-    )
-    for type_item in quotes_by_type:
-        type_item['type_of_source'] = type_choices_dict.get(
-            type_item['type_of_source'], type_item['type_of_source']
-        )
-    type_labels = [item['type_of_source'] for item in quotes_by_type]
-
-    stacked_data = []
-    for type_item in quotes_by_type:
-        type_key = [
-            key for key, val in type_choices_dict.items()
-            if val == type_item['type_of_source']
-        ][0]
-        qs = Quote.objects.filter(type_of_source=type_key)
-        stacked_data.append({
-            'likes': qs.aggregate(total_likes=Sum('likes'))['total_likes']
-            or 0,
-            'dislikes': qs.aggregate(
-                total_dislikes=Sum('dislikes')
-            )['total_dislikes'] or 0,
-        })
-
-    start_date = now() - timedelta(days=7)
-    likes_last_days_qs = (
-        QuoteVote.objects.filter(
-            vote_type='like', created_at__gte=start_date
-        )
-        .values('created_at__date')
-        .annotate(total=Count('id'))
-        .order_by('created_at__date')
-    )
-    dislikes_last_days_qs = (
-        QuoteVote.objects.filter(
-            vote_type='dislike', created_at__gte=start_date
-        )
-        .values('created_at__date')
-        .annotate(total=Count('id'))
-        .order_by('created_at__date')
-    )
-    likes_last_days = [
-        {'date': item['created_at__date'].strftime('%Y-%m-%d'),
-         'total': item['total']}
-        for item in likes_last_days_qs
-    ]
-    dislikes_last_days = [
-        {'date': item['created_at__date'].strftime('%Y-%m-%d'),
-         'total': item['total']}
-        for item in dislikes_last_days_qs
-    ]
-
-    views_by_type_qs = list(
-        Quote.objects.values('type_of_source').annotate(
-            total_views=Sum('views')
-        )
-    )
-    for view_item in views_by_type_qs:
-        view_item['type_of_source'] = type_choices_dict.get(
-            view_item['type_of_source'], view_item['type_of_source']
-        )
-    likes_by_type_qs = list(
-        Quote.objects.values('type_of_source').annotate(
-            total_likes=Sum('likes')
-        )
-    )
-    for like_item in likes_by_type_qs:
-        like_item['type_of_source'] = type_choices_dict.get(
-            like_item['type_of_source'], like_item['type_of_source']
-        )
 
-    top_authors = (
-        User.objects.annotate(total_quotes=Count('quotes'))
-        .order_by('-total_quotes')[:5]
+def _dashboard_etag(request):
+    snapshot = get_dashboard_snapshot()
+    return (
+        f'{snapshot["version"]}-{int(snapshot["modified"].timestamp())}'
     )
 
-    context = {
-        'type_labels': type_labels,
-        'quotes_by_type': quotes_by_type,
-        'stacked_data': stacked_data,
-        'likes_last_days': likes_last_days,
-        'dislikes_last_days': dislikes_last_days,
-        'views_by_type': views_by_type_qs,
-        'likes_by_type': likes_by_type_qs,
-        'top_authors': top_authors,
-    }
 
-    return render(request, 'quotes/dashboard.html', context)
+def _dashboard_last_modified(request):
+    return get_dashboard_snapshot()['modified']
+
+
+@login_required
+@read_replica
+@condition(etag_func=_dashboard_etag,
+           last_modified_func=_dashboard_last_modified)
+def dashboard_data(request):
+    """
+    Возвращает серии графиков дашборда в JSON. Параметр chart
+    позволяет запросить один график.
+    """
+    charts = get_dashboard_snapshot()['charts']
+    chart = request.GET.get('chart')
+    if chart:
+        if chart not in charts:
+            return JsonResponse({'error': 'Неизвестный график'}, status=404)
+        data = charts[chart]
+    else:
+        data = charts
+    response = JsonResponse(data)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @login_required
 def edit_quote(request, quote_id):
     """
-    Редактирование цитаты автором.
+    Редактирование цитаты автором. Форма для показа берет цитату
+    из кэша, сохранение читает ее из базы.
     """
-    quote = get_object_or_404(Quote, id=quote_id)
+    if request.method == 'POST':
+        quote = get_object_or_404(Quote, id=quote_id)
+    else:
+        quote = quote_cache.get(quote_id)
+        if quote is None:
+            raise Http404('Цитата не найдена')
 
-    if quote.author != request.user:
+    if quote.author_id != request.user.id:
         return redirect('random_quote')
 
     if request.method == 'POST':
         form = QuoteForm(request.POST, instance=quote)
         if form.is_valid():
-            form.save()
-            return redirect('random_quote')
+            try:
+                form.save()
+            except ValidationError as exc:
+                form.add_error(None, exc)
+            else:
+                return read_your_writes(redirect('random_quote'))
     else:
         form = QuoteForm(instance=quote)
 
@@ -291,3 +290,67 @@ def edit_quote(request, quote_id):
         'quotes/edit_quote.html',
         {'form': form, 'quote': quote},
     )
+
+
+@staff_member_required
+def export_data(request, model_name):
+    """
+    Потоковая выгрузка цитат или голосов в JSONL или CSV для
+    сотрудников. Параметры: format, type, since, until
+    (даты в формате ISO).
+    """
+    if model_name not in EXPORT_FIELDS:
+        raise Http404('Неизвестный тип выгрузки')
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in ('jsonl', 'csv'):
+        return JsonResponse({'error': 'Неверный формат'}, status=400)
+    try:
+        since, until = (
+            parse_export_date(request.GET.get(name))
+            for name in ('since', 'until')
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Неверная дата'}, status=400)
+
+    queryset = export_queryset(
+        model_name, request.GET.get('type'), since, until
+    )
+    response = StreamingHttpResponse(
+        export_lines(queryset, file_format),
+        content_type=(
+            'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        ),
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{model_name}.{file_format}"'
+    )
+    return response
+
+
+def metrics(request):
+    """
+    Метрики запросов по страницам в текстовом формате Prometheus.
+    """
+    return HttpResponse(
+        registry.render() + quote_cache.render(),
+        content_type='text/plain; version=0.0.4',
+    )
+
+
+def search(request):
+    """
+    Полнотекстовый поиск цитат по тексту и источнику с фильтром
+    по типу источника.
+    """
+    query = request.GET.get('q', '').strip()
+    type_filter = request.GET.get('type')
+    if type_filter not in dict(Quote.TYPE_CHOICES):
+        type_filter = None
+    results = search_quotes(query, type_filter) if query else []
+    context = {
+        'query': query,
+        'results': results,
+        'type_filter': type_filter,
+        'type_choices_sorted': sorted(Quote.TYPE_CHOICES, key=lambda x: x[1]),
+    }
+    return render(request, 'quotes/search.html', context)
@@ -0,0 +1,198 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404
+
+from .cards import bump_card_version
+from .dashboard import invalidate_dashboard
+from .leaderboard import leaderboards
+from .models import Quote, QuoteVote, VoteEvent, VoteLogPosition
+from .quote_cache import quote_cache
+from .voting import COUNTER_FIELDS, AlreadyVoted
+
+POSITION_NAME = 'quote_votes'
+
+
+def current_vote(user, quote_id):
+    """
+    Возвращает последний голос пользователя за цитату: из журнала,
+    если он там есть, иначе из QuoteVote.
+    """
+    return (
+        VoteEvent.objects
+        .filter(user=user, quote_id=quote_id)
+        .order_by('-id')
+        .values_list('vote_type', flat=True)
+        .first()
+    ) or (
+        QuoteVote.objects
+        .filter(user=user, quote_id=quote_id)
+        .values_list('vote_type', flat=True)
+        .first()
+    )
+
+
+def log_vote(user, quote_id, vote_type):
+    """
+    Добавляет голос в журнал и возвращает ожидаемые значения
+    (likes, dislikes) с учетом этого голоса. Цитата читается из кэша
+    объектов, прежний голос пользователя — из журнала и QuoteVote
+    (до двух SELECT), затем выполняется один INSERT в журнал; строки
+    цитат и голосов не блокируются. Выбрасывает AlreadyVoted при
+    повторном голосе того же типа и Http404, если цитаты не существует.
+    """
+    quote = quote_cache.get(quote_id)
+    if quote is None:
+        raise Http404('Цитата не найдена')
+    previous = current_vote(user, quote_id)
+    if previous == vote_type:
+        raise AlreadyVoted
+    VoteEvent.objects.create(
+        user=user, quote_id=quote_id, vote_type=vote_type
+    )
+    counters = {'like': quote.likes, 'dislike': quote.dislikes}
+    counters[vote_type] += 1
+    if previous:
+        counters[previous] = max(counters[previous] - 1, 0)
+    return counters['like'], counters['dislike']
+
+
+def pending_votes(user, quote_ids):
+    """
+    Возвращает еще не перенесенные голоса пользователя за цитаты
+    в виде словаря {quote_id: vote_type}.
+    """
+    position = (
+        VoteLogPosition.objects
+        .filter(name=POSITION_NAME)
+        .values_list('last_event_id', flat=True)
+        .first()
+    ) or 0
+    return dict(
+        VoteEvent.objects
+        .filter(user=user, quote_id__in=quote_ids, id__gt=position)
+        .order_by('id')
+        .values_list('quote_id', 'vote_type')
+    )
+
+
+def fold_events(batch_size=1000):
+    """
+    Переносит следующую пачку записей журнала в QuoteVote и счетчики
+    цитат одной транзакцией вместе с номером последней записи.
+    Повторные голоса того же типа пропускаются. Возвращает количество
+    обработанных записей.
+    """
+    VoteLogPosition.objects.get_or_create(name=POSITION_NAME)
+    with transaction.atomic():
+        # Транзакция начинается с записи, чтобы сразу занять блокировку
+        # записи SQLite: иначе после чтения ее не удастся получить,
+        # если параллельно записали голос
+        VoteLogPosition.objects.filter(name=POSITION_NAME).update(
+            last_event_id=F('last_event_id')
+        )
+        position = VoteLogPosition.objects.get(name=POSITION_NAME)
+        events = list(
+            VoteEvent.objects
+            .filter(id__gt=position.last_event_id)
+            .order_by('id')
+            .values_list('id', 'user_id', 'quote_id', 'vote_type')
+            [:batch_size]
+        )
+        if not events:
+            return 0
+
+        pairs = {(user_id, quote_id) for _, user_id, quote_id, _ in events}
+        existing = {
+            (user_id, quote_id): (vote_id, vote_type)
+            for vote_id, user_id, quote_id, vote_type in
+            QuoteVote.objects
+            .filter(
+                user_id__in={user_id for user_id, _ in pairs},
+                quote_id__in={quote_id for _, quote_id in pairs},
+            )
+            .values_list('id', 'user_id', 'quote_id', 'vote_type')
+            if (user_id, quote_id) in pairs
+        }
+        state = {pair: vote[1] for pair, vote in existing.items()}
+        deltas = defaultdict(Counter)
+        week_changed = False
+        for _, user_id, quote_id, vote_type in events:
+            pair = (user_id, quote_id)
+            previous = state.get(pair)
+            if previous == vote_type:
+                continue
+            week_changed = week_changed or 'like' in (vote_type, previous)
+            deltas[quote_id][COUNTER_FIELDS[vote_type]] += 1
+            if previous:
+                deltas[quote_id][COUNTER_FIELDS[previous]] -= 1
+            state[pair] = vote_type
+
+        created = []
+        switched = defaultdict(list)
+        for pair, vote_type in state.items():
+            if pair not in existing:
+                created.append(QuoteVote(
+                    user_id=pair[0], quote_id=pair[1], vote_type=vote_type
+                ))
+            elif existing[pair][1] != vote_type:
+                switched[vote_type].append(existing[pair][0])
+        QuoteVote.objects.bulk_create(created, batch_size=500)
+        for vote_type, ids in switched.items():
+            QuoteVote.objects.filter(id__in=ids).update(vote_type=vote_type)
+
+        by_delta = defaultdict(list)
+        for quote_id, delta in deltas.items():
+            by_delta[(delta['likes'], delta['dislikes'])].append(quote_id)
+        for (likes, dislikes), ids in by_delta.items():
+            if likes or dislikes:
+                Quote.objects.filter(id__in=ids).update(
+                    likes=F('likes') + likes,
+                    dislikes=F('dislikes') + dislikes,
+                )
+
+        position.last_event_id = events[-1][0]
+        position.save(update_fields=['last_event_id'])
+
+        changed = list(deltas)
+        counts = list(
+            Quote.objects
+            .filter(id__in=[
+                quote_id for quote_id, delta in deltas.items()
+                if delta['likes']
+            ])
+            .values_list('id', 'type_of_source', 'likes')
+        )
+        transaction.on_commit(
+            lambda: _reset_caches(changed, counts, week_changed)
+        )
+    return len(events)
+
+
+def _reset_caches(quote_ids, counts, week_changed):
+    """
+    Сбрасывает кэши, зависящие от счетчиков перенесенных цитат.
+    Рейтинги сбрасываются во всех процессах, только если перенос
+    изменил какой-либо топ.
+    """
+    invalidate_dashboard()
+    if leaderboards.record_counts(counts, week_changed):
+        leaderboards.invalidate()
+    quote_cache.invalidate(*quote_ids)
+    for quote_id in quote_ids:
+        bump_card_version(quote_id)
+
+
+def prune_events():
+    """
+    Удаляет перенесенные записи журнала. Возвращает их количество.
+    """
+    position = (
+        VoteLogPosition.objects
+        .filter(name=POSITION_NAME)
+        .values_list('last_event_id', flat=True)
+        .first()
+    ) or 0
+    deleted, _ = VoteEvent.objects.filter(id__lte=position).delete()
+    return deleted
@@ -0,0 +1,97 @@
+from django.db import IntegrityError, connection, transaction
+from django.http import Http404
+
+from .cards import bump_card_version
+from .dashboard import invalidate_dashboard
+from .leaderboard import leaderboards
+from .models import Quote, QuoteVote
+from .quote_cache import quote_cache
+from .write_queue import write_queue
+
+
+class AlreadyVoted(Exception):
+    """
+    Пользователь уже голосовал за цитату этим способом.
+    """
+
+
+COUNTER_FIELDS = {'like': 'likes', 'dislike': 'dislikes'}
+
+
+def _update_counters(quote_id, increment, decrement=None):
+    """
+    Атомарно меняет счетчики цитаты одним UPDATE ... RETURNING и
+    возвращает новые значения (likes, dislikes, type_of_source) или
+    None, если цитаты не существует.
+    """
+    table = connection.ops.quote_name(Quote._meta.db_table)
+    assignments = [f'{increment} = {increment} + 1']
+    if decrement:
+        assignments.append(f'{decrement} = {decrement} - 1')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {", ".join(assignments)} '
+            f'WHERE id = %s RETURNING likes, dislikes, type_of_source',
+            [quote_id],
+        )
+        return cursor.fetchone()
+
+
+def cast_vote(user, quote_id, vote_type):
+    """
+    Сохраняет голос пользователя и обновляет счетчики цитаты в одной
+    транзакции. Возвращает новые значения (likes, dislikes).
+    Выбрасывает AlreadyVoted при повторном голосе того же типа и
+    Http404, если цитаты не существует. При включенной очереди записи
+    голос записывает поток писателя.
+    """
+    return write_queue.run(_cast_vote, user, quote_id, vote_type)
+
+
+def _cast_vote(user, quote_id, vote_type):
+    opposite = 'dislike' if vote_type == 'like' else 'like'
+    with transaction.atomic():
+        changed = (
+            QuoteVote.objects
+            .filter(user=user, quote_id=quote_id, vote_type=opposite)
+            .update(vote_type=vote_type)
+        )
+        if not changed:
+            try:
+                with transaction.atomic():
+                    QuoteVote.objects.create(
+                        user=user, quote_id=quote_id, vote_type=vote_type
+                    )
+            except IntegrityError:
+                raise AlreadyVoted
+        row = _update_counters(
+            quote_id,
+            COUNTER_FIELDS[vote_type],
+            COUNTER_FIELDS[opposite] if changed else None,
+        )
+        if row is None:
+            raise Http404('Цитата не найдена')
+        likes, dislikes, type_of_source = row
+        transaction.on_commit(invalidate_dashboard)
+        transaction.on_commit(lambda: bump_card_version(quote_id))
+        transaction.on_commit(lambda: quote_cache.invalidate(quote_id))
+        transaction.on_commit(
+            lambda: leaderboards.record_vote(
+                quote_id, type_of_source, likes, vote_type, bool(changed)
+            )
+        )
+    return likes, dislikes
+
+
+def get_user_votes(user, quote_ids):
+    """
+    Возвращает голоса пользователя за указанные цитаты одним запросом
+    в виде словаря {quote_id: vote_type}.
+    """
+    if not user.is_authenticated or not quote_ids:
+        return {}
+    return dict(
+        QuoteVote.objects
+        .filter(user=user, quote_id__in=quote_ids)
+        .values_list('quote_id', 'vote_type')
+    )
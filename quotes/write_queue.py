@@ -0,0 +1,69 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+
+class WriteQueue:
+    """
+    Очередь записи с одним писателем. Если включена настройка
+    QUOTES_WRITE_QUEUE, функции, переданные в run, выполняются по одной
+    в отдельном потоке со своим соединением с базой. Параллельные
+    запросы тогда не соревнуются за блокировку записи SQLite,
+    а чтения не ждут повторных попыток захвата блокировки.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def enabled():
+        return getattr(settings, 'QUOTES_WRITE_QUEUE', False)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Выполняет func в потоке писателя и возвращает ее результат или
+        выбрасывает ее исключение. Внутри открытой транзакции и при
+        выключенной очереди функция выполняется в текущем потоке.
+        """
+        if (
+            not self.enabled()
+            or connection.in_atomic_block
+            or threading.current_thread() is self._thread
+        ):
+            return func(*args, **kwargs)
+        future = Future()
+        self._start()
+        self._queue.put((future, func, args, kwargs))
+        return future.result()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._work, name='quotes-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            future, func, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as exc:
+                if isinstance(exc, DatabaseError):
+                    # Соединение писателя могло остаться в плохом
+                    # состоянии, следующая запись откроет новое
+                    connection.close()
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+write_queue = WriteQueue()
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quotes_site.settings')
+os.environ.setdefault('QUOTES_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+# Буфер просмотров записывается по таймеру и при завершении только
+# в процессе сервера
+from quotes.view_counter import view_counter  # noqa: E402
+
+view_counter.start()
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quotes.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'quotes.cards.card_settings',
             ],
         },
     },
@@ -79,9 +81,27 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Тестовая база в файле: тесты конкурентной записи открывают
+        # соединения из нескольких потоков
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Реплика для чтения: второй файл SQLite, который копирует команда
+# sync_replica. Включается переменной окружения QUOTES_REPLICA=1
+QUOTES_REPLICA_ALIAS = 'replica'
+if os.environ.get('QUOTES_REPLICA') == '1':
+    DATABASES[QUOTES_REPLICA_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['quotes.routers.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает основную базу
+QUOTES_REPLICA_LAG = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -134,3 +154,73 @@ LOGIN_REDIRECT_URL = 'random_quote'
 LOGOUT_REDIRECT_URL = 'random_quote'
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Асинхронные версии random_quote, vote и top_quotes (включается в asgi.py)
+QUOTES_ASYNC_VIEWS = os.environ.get('QUOTES_ASYNC_VIEWS') == '1'
+
+# Логировать запросы, превысившие бюджет SQL-запросов или времени (секунды)
+QUOTES_METRICS_QUERY_BUDGET = None
+QUOTES_METRICS_LATENCY_BUDGET = None
+
+# Общий кэш процессов. Для нескольких процессов замените LocMemCache
+# на Redis или Memcached
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'quotes',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Кэш цитат: псевдоним общего кэша, размер LRU в памяти процесса,
+# время жизни записей в памяти без сверки версии и в общем кэше
+QUOTES_QUOTE_CACHE_ALIAS = 'default'
+QUOTES_QUOTE_CACHE_SIZE = 1000
+QUOTES_QUOTE_CACHE_LOCAL_TTL = 5
+QUOTES_QUOTE_CACHE_TTL = 3600
+
+# Голосование только добавляет запись в журнал голосов, переносит
+# голоса команда fold_votes. Сброс кэшей после переноса доходит до
+# веб-процессов через кэш, поэтому нужен общий бэкенд (проверка quotes.E001)
+QUOTES_VOTE_LOG = os.environ.get('QUOTES_VOTE_LOG') == '1'
+
+# Период (секунды) фоновой перестройки индексов в памяти процесса:
+# весов случайного выбора и источников
+QUOTES_INDEX_REFRESH = 300
+
+# Период перестройки рейтингов и время жизни снимка дашборда (секунды)
+QUOTES_LEADERBOARD_REFRESH = 300
+QUOTES_DASHBOARD_TTL = 60
+
+# Пул заранее выбранных случайных цитат и порог его пополнения
+QUOTES_SAMPLE_POOL_SIZE = 1000
+QUOTES_SAMPLE_POOL_LOW_WATER = 250
+
+# Фильтр уже показанных посетителю цитат: размер в битах и число
+# попыток выбрать непоказанную цитату
+QUOTES_SEEN_FILTER_BITS = 8192
+QUOTES_SEEN_ATTEMPTS = 10
+
+# Прагмы, которые применяются к каждому новому соединению с SQLite
+QUOTES_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'busy_timeout': 5000,
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+}
+
+# Записывать голоса и просмотры через один поток-писатель
+QUOTES_WRITE_QUEUE = os.environ.get('QUOTES_WRITE_QUEUE') == '1'
+
+# Время жизни кэша фрагментов карточек цитат (секунды)
+QUOTES_CARD_CACHE_TTL = 3600
+
+# Буфер просмотров: сколько просмотров и секунд копить до записи и
+# файл, куда процесс сервера сохраняет их, если при завершении база
+# недоступна (записывает команда flush_views)
+QUOTES_VIEW_BUFFER_SIZE = 100
+QUOTES_VIEW_BUFFER_INTERVAL = 10
+QUOTES_VIEW_BUFFER_SPOOL = os.environ.get(
+    'QUOTES_VIEW_BUFFER_SPOOL', BASE_DIR / 'view_counts.spool'
+)
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quotes_site.settings')
 
 application = get_wsgi_application()
+
+# Буфер просмотров записывается по таймеру и при завершении только
+# в процессе сервера
+from quotes.view_counter import view_counter  # noqa: E402
+
+view_counter.start()